@@ -0,0 +1,53 @@
+"""Сравнение стоимости разбора ответов TMDB: стандартный json против orjson.
+
+Запуск: python -m benchmarks.bench_json_decode
+"""
+import json
+import time
+
+from benchmarks.data import make_page
+from models.movie import project_movies
+from services import json_codec
+
+
+PAGES_PER_SEARCH = 100  # до 50 страниц /search/movie и 50 страниц /discover/movie
+ROUNDS = 20
+
+
+def decode_search(bodies, loads) -> int:
+    """Разбирает все страницы одного поиска и проецирует их в Movie."""
+    count = 0
+    for body in bodies:
+        count += len(project_movies(loads(body)["results"]))
+    return count
+
+
+def measure(bodies, loads) -> float:
+    """Среднее процессорное время на один поиск, мс."""
+    decode_search(bodies, loads)
+    started = time.process_time()
+    for _ in range(ROUNDS):
+        decode_search(bodies, loads)
+    return (time.process_time() - started) / ROUNDS * 1000
+
+
+def main():
+    bodies = [json.dumps(make_page(page, total_pages=PAGES_PER_SEARCH)).encode("utf-8")
+              for page in range(1, PAGES_PER_SEARCH + 1)]
+    size_kb = sum(len(body) for body in bodies) / 1024
+
+    stdlib_ms = measure(bodies, json.loads)
+    print(f"Страниц на поиск: {PAGES_PER_SEARCH} ({size_kb:.0f} КБ)")
+    print(f"json (stdlib):   {stdlib_ms:8.2f} мс CPU на поиск")
+
+    if json_codec.JSON_BACKEND == "json":
+        print("orjson не установлен - используется стандартный json")
+        return
+
+    fast_ms = measure(bodies, json_codec.loads)
+    print(f"{json_codec.JSON_BACKEND + ':':<16} {fast_ms:8.2f} мс CPU на поиск")
+    print(f"Экономия:        {stdlib_ms - fast_ms:8.2f} мс ({stdlib_ms / fast_ms:.1f}x)")
+
+
+if __name__ == "__main__":
+    main()
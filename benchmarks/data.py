@@ -0,0 +1,72 @@
+import random
+from typing import Any, Dict, List
+
+
+GENRE_IDS = [28, 12, 16, 35, 80, 99, 18, 10751, 14, 36, 27, 10402, 9648, 10749, 878, 10770, 53, 10752, 37]
+
+GENRES = {
+    "боевик": 28, "приключения": 12, "мультфильм": 16, "комедия": 35, "криминал": 80,
+    "документальный": 99, "драма": 18, "семейный": 10751, "фэнтези": 14, "история": 36,
+    "ужасы": 27, "музыка": 10402, "детектив": 9648, "мелодрама": 10749, "фантастика": 878,
+    "телевизионный фильм": 10770, "триллер": 53, "военный": 10752, "вестерн": 37
+}
+
+
+def make_movie(movie_id: int, rng: random.Random) -> Dict[str, Any]:
+    """Фильм в формате результатов поиска TMDB."""
+    year = rng.randint(1950, 2025)
+    return {
+        "adult": False,
+        "backdrop_path": f"/{rng.getrandbits(64):x}.jpg",
+        "genre_ids": rng.sample(GENRE_IDS, rng.randint(1, 4)),
+        "id": movie_id,
+        "original_language": rng.choice(["en", "ru", "fr", "ja", "ko"]),
+        "original_title": f"Original Title {movie_id}",
+        "overview": "Описание фильма. " * rng.randint(10, 40),
+        "popularity": round(rng.uniform(0.5, 3000), 3),
+        "poster_path": f"/{rng.getrandbits(64):x}.jpg" if rng.random() > 0.1 else None,
+        "release_date": f"{year}-{rng.randint(1, 12):02d}-{rng.randint(1, 28):02d}",
+        "title": f"Фильм номер {movie_id}",
+        "video": False,
+        "vote_average": round(rng.uniform(1, 9.5), 1),
+        "vote_count": rng.randint(0, 30000)
+    }
+
+
+def make_page(page: int, total_pages: int = 50, per_page: int = 20, seed: int = 0) -> Dict[str, Any]:
+    """Страница ответа /search/movie или /discover/movie."""
+    rng = random.Random(seed * 100003 + page)
+    first_id = seed * 1000000 + (page - 1) * per_page + 1
+    return {
+        "page": page,
+        "results": [make_movie(first_id + i, rng) for i in range(per_page)],
+        "total_pages": total_pages,
+        "total_results": total_pages * per_page
+    }
+
+
+def make_movies(count: int, seed: int = 0) -> List[Dict[str, Any]]:
+    """Плоский список из count фильмов в формате TMDB."""
+    movies = []
+    page = 1
+    while len(movies) < count:
+        movies.extend(make_page(page, seed=seed)["results"])
+        page += 1
+    return movies[:count]
+
+
+def make_details(movie_id: int) -> Dict[str, Any]:
+    """Детали фильма в формате /movie/{id} с credits и videos."""
+    rng = random.Random(movie_id)
+    movie = make_movie(movie_id, rng)
+    genre_ids = movie.pop("genre_ids")
+    movie.update({
+        "genres": [{"id": g, "name": name} for name, g in GENRES.items() if g in genre_ids],
+        "runtime": rng.randint(70, 190),
+        "budget": rng.randint(0, 200) * 1000000,
+        "revenue": rng.randint(0, 900) * 1000000,
+        "production_countries": [{"iso_3166_1": "US", "name": "США"}],
+        "credits": {"cast": [{"id": i, "name": f"Актер {i}", "character": f"Роль {i}"} for i in range(30)], "crew": []},
+        "videos": {"results": []}
+    })
+    return movie
@@ -0,0 +1,367 @@
+"""Нагрузочный стенд: настоящий Dispatcher, симулированные пользователи, локальный TMDB.
+
+Каждый пользователь проходит мастер простого или расширенного поиска,
+листает результаты, открывает детали фильма и выбирает фильм. Исходящие
+вызовы Bot API перехватываются фейковой сессией, данные отдает
+tools.tmdb_standin (по умолчанию - в этом же процессе).
+
+Запуск:
+    python -m benchmarks.load_test --users 2000 --flows simple,advanced
+    python -m benchmarks.load_test --users 500 --tmdb-url http://127.0.0.1:8765/3 --trace-memory
+    python -m benchmarks.load_test --users 1000 --fsm-storage /tmp/fsm_load.sqlite3
+"""
+import argparse
+import asyncio
+import logging
+import os
+import random
+import resource
+import time
+import tracemalloc
+from collections import defaultdict
+from datetime import datetime
+from typing import Any, Dict, List, get_args
+
+import aiohttp
+
+
+STANDIN_PORT = 8765
+GENRE_CHOICES = [28, 12, 35, 18, 878, 53, 27, 10749]
+
+
+def percentile(samples: List[float], q: float) -> float:
+    if not samples:
+        return 0.0
+    ordered = sorted(samples)
+    return ordered[min(int(q * len(ordered)), len(ordered) - 1)]
+
+
+def make_fake_session():
+    """Сессия Bot API, которая ничего не отправляет в сеть."""
+    from aiogram.client.session.base import BaseSession
+    from aiogram.methods import GetMe
+    from aiogram.types import Chat, Message, User
+
+    class FakeSession(BaseSession):
+        def __init__(self):
+            super().__init__()
+            self.calls = defaultdict(int)
+            self._message_id = 0
+
+        async def make_request(self, bot, method, timeout=None):
+            self.calls[type(method).__name__] += 1
+            if isinstance(method, GetMe):
+                return User(id=42, is_bot=True, first_name="LoadTest", username="load_test_bot")
+
+            chat_id = getattr(method, "chat_id", None)
+            returning = method.__returning__
+            if chat_id is None or Message not in (returning, *get_args(returning)):
+                return True
+
+            message_id = getattr(method, "message_id", None)
+            if message_id is None:
+                self._message_id += 1
+                message_id = self._message_id
+            return Message(
+                message_id=message_id,
+                date=datetime.now(),
+                chat=Chat(id=chat_id, type="private"),
+                text=getattr(method, "text", None)
+            ).as_(bot)
+
+        async def stream_content(self, url, headers=None, timeout=30, chunk_size=65536, raise_for_status=True):
+            yield b""
+
+        async def close(self):
+            pass
+
+    return FakeSession()
+
+
+class SimulatedUser:
+    """Один пользователь бота: отправляет апдейты и замеряет время обработки."""
+
+    def __init__(self, harness: "LoadHarness", user_id: int, rng: random.Random):
+        self.harness = harness
+        self.user_id = user_id
+        self.rng = rng
+        self.message_id = 0
+
+    def _user(self) -> Dict[str, Any]:
+        return {"id": self.user_id, "is_bot": False, "first_name": f"User {self.user_id}"}
+
+    def _chat(self) -> Dict[str, Any]:
+        return {"id": self.user_id, "type": "private"}
+
+    async def send_text(self, step: str, text: str):
+        self.message_id += 1
+        message = {
+            "message_id": self.message_id,
+            "date": int(time.time()),
+            "chat": self._chat(),
+            "from": self._user(),
+            "text": text
+        }
+        if text.startswith("/"):
+            message["entities"] = [{"type": "bot_command", "offset": 0, "length": len(text)}]
+        await self.harness.feed(step, {"message": message})
+
+    async def press(self, step: str, data: str):
+        bot_message = {
+            "message_id": self.message_id,
+            "date": int(time.time()),
+            "chat": self._chat(),
+            "from": {"id": 42, "is_bot": True, "first_name": "LoadTest"},
+            "text": "..."
+        }
+        await self.harness.feed(step, {"callback_query": {
+            "id": f"{self.user_id}-{self.rng.random()}",
+            "from": self._user(),
+            "chat_instance": str(self.user_id),
+            "message": bot_message,
+            "data": data
+        }})
+
+    async def think(self):
+        if self.harness.think_time:
+            await asyncio.sleep(self.rng.uniform(0, 2 * self.harness.think_time))
+
+    async def stored_results(self):
+        """Результаты поиска пользователя из FSM и общего реестра."""
+        from services.result_source import search_results
+
+        data = await self.harness.state_for(self.user_id).get_data()
+        return search_results.get(data.get("results_key"), self.user_id)
+
+    async def browse_results(self):
+        """Пагинация, детали фильма и выбор фильма."""
+        results = await self.stored_results()
+        if results is None or not results.movies:
+            self.harness.missing_results += 1
+            return
+
+        await self.think()
+        await self.press("page_2", "search_page_2")
+        await self.think()
+        movie = self.rng.choice(results.movies[:20])
+        await self.press("details", f"details_{movie.id}")
+        await self.think()
+        await self.press("back_to_results", "back_to_results")
+        await self.think()
+        await self.press("ask_movie_choice", "ask_movie_choice")
+        await self.send_text("movie_choice", movie.title)
+
+    async def run_simple(self):
+        await self.send_text("start", "/start")
+        await self.think()
+        await self.press("simple_search", "simple_search")
+        if self.rng.random() < 0.5:
+            await self.send_text("title", self.rng.choice(["матрица", "интерстеллар", "дюна", "аватар"]))
+        else:
+            await self.press("skip_title", "skip")
+        for genre_id in self.rng.sample(GENRE_CHOICES, self.rng.randint(1, 2)):
+            await self.press("genre", f"genre_{genre_id}")
+        await self.press("genres_done", "genres_done")
+        await self.think()
+        await self.press("search", "skip")
+        await self.browse_results()
+
+    async def run_advanced(self):
+        await self.send_text("start", "/start")
+        await self.think()
+        await self.press("advanced_search", "advanced_search")
+        await self.press("skip_title", "skip")
+        await self.send_text("rating", str(self.rng.choice([5, 6, 7, 7.5, 8])))
+        await self.press("skip_language", "skip")
+        await self.press("skip_region", "skip")
+        await self.press("adult", "adult_no")
+        await self.press("sort", self.rng.choice(["sort_popularity.desc", "sort_vote_average.desc"]))
+        await self.think()
+        await self.press("search", "sort_done")
+        await self.browse_results()
+
+
+class LoadHarness:
+    """Гоняет симулированных пользователей через диспетчер и собирает метрики."""
+
+    def __init__(self, dp, bot, tmdb_url: str, think_time: float):
+        self.dp = dp
+        self.bot = bot
+        self.tmdb_url = tmdb_url
+        self.think_time = think_time
+        self.latencies: Dict[str, List[float]] = defaultdict(list)
+        self.errors = 0
+        self.missing_results = 0
+        self._update_id = 0
+
+    def state_for(self, user_id: int):
+        return self.dp.fsm.get_context(self.bot, chat_id=user_id, user_id=user_id)
+
+    async def feed(self, step: str, payload: Dict[str, Any]):
+        from aiogram.types import Update
+
+        self._update_id += 1
+        update = Update.model_validate({"update_id": self._update_id, **payload}, context={"bot": self.bot})
+        started = time.perf_counter()
+        try:
+            await self.dp.feed_update(self.bot, update)
+        except Exception as e:
+            self.errors += 1
+            print(f"[ERROR] {step}: {e}")
+        self.latencies[step].append(time.perf_counter() - started)
+
+    def reset(self):
+        self.latencies.clear()
+        self.errors = 0
+        self.missing_results = 0
+
+    async def tmdb_stats(self, reset: bool = False) -> Dict[str, Any]:
+        """Счетчики вызовов TMDB с заменителя."""
+        root = self.tmdb_url.rsplit("/3", 1)[0]
+        async with aiohttp.ClientSession() as session:
+            async with session.get(root + "/__stats") as resp:
+                stats = await resp.json()
+            if reset:
+                async with session.post(root + "/__reset"):
+                    pass
+        return stats
+
+    async def run_phase(self, flow: str, users: int, ramp: float, first_user_id: int, seed: int) -> Dict[str, Any]:
+        """Запускает users пользователей одного сценария одновременно."""
+        self.reset()
+        await self.tmdb_stats(reset=True)
+
+        async def run_user(index: int):
+            await asyncio.sleep(ramp * index / users)
+            user = SimulatedUser(self, first_user_id + index, random.Random(seed + index))
+            await getattr(user, f"run_{flow}")()
+
+        from services.query_planner import query_planner
+        plans_before = query_planner.plans.copy()
+
+        if tracemalloc.is_tracing():
+            tracemalloc.reset_peak()
+        memory_before = tracemalloc.get_traced_memory()[0] if tracemalloc.is_tracing() else 0
+        rss_before = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+        started = time.perf_counter()
+        await asyncio.gather(*(run_user(i) for i in range(users)))
+        elapsed = time.perf_counter() - started
+
+        tmdb = await self.tmdb_stats()
+        all_latencies = [x for samples in self.latencies.values() for x in samples]
+        report = {
+            "flow": flow,
+            "users": users,
+            "elapsed": elapsed,
+            "updates": len(all_latencies),
+            "throughput": len(all_latencies) / elapsed if elapsed else 0.0,
+            "flows_per_sec": users / elapsed if elapsed else 0.0,
+            "p50": percentile(all_latencies, 0.50),
+            "p95": percentile(all_latencies, 0.95),
+            "p99": percentile(all_latencies, 0.99),
+            "steps": {step: (percentile(s, 0.50), percentile(s, 0.95), percentile(s, 0.99), len(s))
+                      for step, s in self.latencies.items()},
+            "tmdb_calls": tmdb["total"],
+            "tmdb_per_flow": tmdb["total"] / users,
+            "tmdb_endpoints": tmdb["calls"],
+            "tmdb_statuses": tmdb["statuses"],
+            "plans": dict(query_planner.plans - plans_before),
+            "errors": self.errors,
+            "missing_results": self.missing_results,
+            "rss_growth_kb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss - rss_before
+        }
+        if tracemalloc.is_tracing():
+            current, peak = tracemalloc.get_traced_memory()
+            report["peak_per_session"] = (peak - memory_before) / users
+            report["retained_per_session"] = (current - memory_before) / users
+        return report
+
+
+def print_report(report: Dict[str, Any]):
+    ms = 1000
+    print(f"\n=== {report['flow']}: {report['users']} пользователей за {report['elapsed']:.1f} с ===")
+    print(f"Апдейтов: {report['updates']} ({report['throughput']:.0f}/с), "
+          f"сценариев: {report['flows_per_sec']:.1f}/с")
+    print(f"Задержка обработчиков: p50 {report['p50'] * ms:.1f} мс, "
+          f"p95 {report['p95'] * ms:.1f} мс, p99 {report['p99'] * ms:.1f} мс")
+    for step, (p50, p95, p99, count) in sorted(report["steps"].items(), key=lambda item: -item[1][1]):
+        print(f"  {step:<18} p50 {p50 * ms:7.1f}  p95 {p95 * ms:7.1f}  p99 {p99 * ms:7.1f} мс  ({count})")
+    print(f"Вызовов TMDB: {report['tmdb_calls']} ({report['tmdb_per_flow']:.1f} на сценарий) "
+          f"{report['tmdb_endpoints']} статусы {report['tmdb_statuses']}")
+    print(f"Планы запросов: {report['plans']}")
+    if "peak_per_session" in report:
+        print(f"Память на сессию: пик {report['peak_per_session'] / 1024:.1f} КБ, "
+              f"удерживается {report['retained_per_session'] / 1024:.1f} КБ")
+    print(f"Рост RSS: {report['rss_growth_kb'] / 1024:.1f} МБ")
+    if report["errors"] or report["missing_results"]:
+        print(f"Ошибок: {report['errors']}, результаты не найдены: {report['missing_results']}")
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Нагрузочный тест бота")
+    parser.add_argument("--users", type=int, default=1000, help="одновременных пользователей в сценарии")
+    parser.add_argument("--flows", default="simple,advanced", help="сценарии через запятую")
+    parser.add_argument("--ramp", type=float, default=2.0, help="время подключения всех пользователей, с")
+    parser.add_argument("--think", type=float, default=0.0, help="средняя пауза пользователя между шагами, с")
+    parser.add_argument("--tmdb-url", default=None, help="внешний заменитель TMDB (по умолчанию - встроенный)")
+    parser.add_argument("--latency", type=float, default=0.05, help="задержка встроенного заменителя, с")
+    parser.add_argument("--rate-429", type=float, default=0.0, help="доля 429 у встроенного заменителя")
+    parser.add_argument("--fsm-storage", default=None,
+                        help="файл SQLite для состояний FSM (по умолчанию - в памяти)")
+    parser.add_argument("--trace-memory", action="store_true", help="точный учет памяти (замедляет работу)")
+    parser.add_argument("--seed", type=int, default=0)
+    return parser.parse_args()
+
+
+async def run(args: argparse.Namespace):
+    from aiogram import Bot
+    from main import create_dispatcher
+    from tools.tmdb_standin import StandInConfig, start_server
+
+    runner = None
+    if args.tmdb_url is None:
+        runner = await start_server(
+            StandInConfig(latency=args.latency, rate_429=args.rate_429, fixtures_dir=None, seed=args.seed),
+            port=STANDIN_PORT
+        )
+
+    # Журнал каждого апдейта и запроса сам по себе становится узким местом
+    logging.getLogger("aiogram.event").setLevel(logging.WARNING)
+    logging.getLogger("aiohttp.access").setLevel(logging.WARNING)
+
+    storage = None
+    if args.fsm_storage:
+        from services.fsm_storage import SQLiteStorage
+        storage = SQLiteStorage(args.fsm_storage)
+    dp = create_dispatcher(storage)
+    bot = Bot(token="42:LOAD-TEST", session=make_fake_session())
+    await dp.emit_startup(bot=bot, dispatcher=dp)
+
+    if args.trace_memory:
+        tracemalloc.start()
+
+    harness = LoadHarness(dp, bot, os.environ["TMDB_BASE_URL"], args.think)
+    try:
+        first_user_id = 1
+        for flow in args.flows.split(","):
+            report = await harness.run_phase(flow.strip(), args.users, args.ramp, first_user_id, args.seed)
+            print_report(report)
+            first_user_id += args.users
+    finally:
+        await dp.emit_shutdown(bot=bot, dispatcher=dp)
+        await bot.session.close()
+        if runner is not None:
+            await runner.cleanup()
+
+
+def main():
+    args = parse_args()
+    # Настройки читаются при импорте config, поэтому окружение готовим заранее
+    os.environ["TMDB_BASE_URL"] = args.tmdb_url or f"http://127.0.0.1:{STANDIN_PORT}/3"
+    os.environ.setdefault("TMDB_DISK_CACHE_PATH", "")
+    asyncio.run(run(args))
+
+
+if __name__ == "__main__":
+    main()
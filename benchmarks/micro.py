@@ -0,0 +1,298 @@
+"""Микробенчмарки горячих участков, выполняемых на каждое нажатие, с проверкой регрессий.
+
+Запуск:
+    python -m benchmarks.micro              # сравнить с сохраненной базой
+    python -m benchmarks.micro --save       # записать новую базу
+    python -m benchmarks.micro --threshold 0.3 --filter format
+
+Каждый замер нормируется на калибровочную нагрузку, измеренную рядом с ним,
+поэтому базу, снятую на одной машине, можно сравнивать с прогоном на другой,
+а колебания скорости общей виртуальной машины в основном взаимно гасятся.
+Кейс, превысивший порог, перемеряется; процесс завершается с кодом 1, только
+если замедление подтвердилось.
+"""
+import argparse
+import json
+import os
+import platform
+import random
+import statistics
+import sys
+import time
+import timeit
+from typing import Any, Callable, Dict, List, Tuple
+
+from benchmarks.data import GENRES, make_details, make_movies
+from config import TMDB_RESULTS_PER_PAGE
+from keyboards.inline import get_genres_keyboard
+from models.movie import Movie, project_movies
+from services.movie_service import MovieService
+from services.result_merge import KWayMerge
+from services.result_source import LazySearchResults
+from services.tmdb_api import TMDBApi
+from utils.formatters import format_movie_details, format_movies_page
+from utils.pagination import Paginator
+
+
+# Размеры выдач, которые бот реально собирает: от одной страницы TMDB до
+# больших наборов; короткие вызовы повторяются внутри замера (SAMPLE_TIME)
+SIZES = [20, 200, 2000]
+ROUNDS = 15
+# Минимальная длительность одного замера, секунды процессорного времени
+SAMPLE_TIME = 0.02
+CONFIRM_ATTEMPTS = 2
+CALIBRATION = "__calibration__"
+DEFAULT_THRESHOLD = 0.25
+DEFAULT_BASELINE = os.path.join(os.path.dirname(__file__), "baselines", "micro.json")
+PER_PAGE = 10
+
+# Кейс: имя -> функция, которая готовит данные и возвращает замеряемый вызов
+Case = Callable[[int], Callable[[], Any]]
+
+
+def movies_of(size: int) -> List[Movie]:
+    return project_movies(make_movies(size, seed=size))
+
+
+def case_filter_movies(size: int):
+    api = TMDBApi()
+    movies = movies_of(size)
+    return lambda: api._filter_movies(movies, genre_ids=[28, 12], min_rating=6.0)
+
+
+def case_dedupe(size: int):
+    # Поиск по названию и discover пересекаются примерно наполовину
+    movies = movies_of(size)
+    batch = movies + movies[:size // 2]
+
+    def run():
+        LazySearchResults([])._append(batch)
+    return run
+
+
+def case_kway_merge(size: int):
+    # Как в search_movies: discover упорядочен по популярности, поиск
+    # по названию - по релевантности и наполовину пересекается с discover
+    movies = movies_of(size)
+    discover = sorted(movies, key=lambda movie: -movie.popularity)
+    search = movies[:size // 2]
+    sources = [
+        ([discover[i:i + TMDB_RESULTS_PER_PAGE] for i in range(0, len(discover), TMDB_RESULTS_PER_PAGE)], True),
+        ([search[i:i + TMDB_RESULTS_PER_PAGE] for i in range(0, len(search), TMDB_RESULTS_PER_PAGE)], False),
+    ]
+    steps = max(len(pages) for pages, _ in sources)
+
+    def run():
+        merge = KWayMerge(len(sources), "popularity.desc")
+        results = LazySearchResults([])
+        # Страницы источников приходят по очереди, как в _load_step
+        for step in range(steps):
+            for index, (pages, ordered) in enumerate(sources):
+                if step < len(pages):
+                    merge.push(index, pages[step], presorted=ordered)
+                if step == len(pages) - 1:
+                    merge.finish(index)
+            results._append(merge.pop_ready(size))
+        results._append(merge.pop_ready(size))
+    return run
+
+
+def case_post_process(size: int):
+    service = MovieService()
+    movies = movies_of(size)
+    filters = {"sort_by": "popularity.desc"}
+    return lambda: service._post_process_movies(movies, filters)
+
+
+# Одна страница стоит единицы микросекунд - слишком мало для стабильного
+# замера, поэтому кейсы ниже листают сразу BROWSE_PAGES страниц
+BROWSE_PAGES = 20
+
+
+def browse_pages(size: int) -> List[int]:
+    last = max(1, size // PER_PAGE)
+    return [1 + i * (last - 1) // (BROWSE_PAGES - 1) for i in range(BROWSE_PAGES)]
+
+
+def case_format_movies_page(size: int):
+    movies = movies_of(size)
+    pages = browse_pages(size)
+
+    def run():
+        for page in pages:
+            format_movies_page(movies, page, PER_PAGE, total_count=size)
+    return run
+
+
+def case_paginator(size: int):
+    movies = movies_of(size)
+    pages = browse_pages(size)
+
+    def run():
+        paginator = Paginator(movies, PER_PAGE)
+        for page in pages:
+            paginator.get_page(page)
+    return run
+
+
+def case_format_movie_details(size: int):
+    # Карточки разных фильмов, как при просмотре страницы результатов
+    details = [make_details(size + i) for i in range(PER_PAGE)]
+
+    def run():
+        for movie in details:
+            format_movie_details(movie)
+    return run
+
+
+def case_genres_keyboard(size: int):
+    selected = random.Random(size).sample(list(GENRES.values()), 3)
+    return lambda: get_genres_keyboard(GENRES, selected)
+
+
+# (имя, кейс, зависит ли от размера выборки)
+CASES: List[Tuple[str, Case, bool]] = [
+    ("tmdb_api._filter_movies", case_filter_movies, True),
+    ("lazy_results.dedupe", case_dedupe, True),
+    ("result_merge.kway_merge", case_kway_merge, True),
+    ("movie_service._post_process_movies", case_post_process, True),
+    ("format_movies_page", case_format_movies_page, True),
+    ("paginator.get_page", case_paginator, True),
+    ("format_movie_details", case_format_movie_details, False),
+    ("get_genres_keyboard", case_genres_keyboard, False),
+]
+
+
+def calibration_workload() -> Callable[[], Any]:
+    """Эталонная чисто-питоновская нагрузка для нормирования между машинами."""
+    rng = random.Random(0)
+    rows = [{"id": i, "value": rng.random()} for i in range(2000)]
+    return lambda: sorted((r for r in rows if r["value"] > 0.3), key=lambda r: r["value"])
+
+
+def build_timers(name_filter: str = "") -> Dict[str, timeit.Timer]:
+    timers = {}
+    for name, case, sized in CASES:
+        for size in (SIZES if sized else [SIZES[0]]):
+            key = f"{name}[{size}]" if sized else name
+            if name_filter and name_filter not in key:
+                continue
+            timers[key] = timeit.Timer(case(size), timer=time.process_time)
+    return timers
+
+
+def calls_per_sample(timer: timeit.Timer) -> int:
+    """Сколько вызовов нужно, чтобы замер длился не меньше SAMPLE_TIME."""
+    number = 1
+    while True:
+        if timer.timeit(number) >= SAMPLE_TIME:
+            return number
+        number *= 2
+
+
+def run_suite(name_filter: str = "", rounds: int = ROUNDS) -> Tuple[Dict[str, float], float]:
+    """Время одного вызова каждого кейса в единицах калибровки и сама калибровка, секунды.
+
+    Кейсы замеряются вперемешку по кругу, а каждый замер делится на соседний
+    замер калибровки: так кратковременные провалы производительности машины
+    не ложатся целиком на один кейс. Из раундов берется медиана отношений -
+    на общей виртуальной машине она заметно устойчивее минимума.
+    """
+    calibration_timer = timeit.Timer(calibration_workload(), timer=time.process_time)
+    timers = build_timers(name_filter)
+    calibration_number = calls_per_sample(calibration_timer)
+    numbers = {key: calls_per_sample(timer) for key, timer in timers.items()}
+
+    def calibration_sample() -> float:
+        return calibration_timer.timeit(calibration_number) / calibration_number
+
+    ratios: Dict[str, List[float]] = {key: [] for key in timers}
+    calibrations = []
+    for _ in range(rounds):
+        for key, timer in timers.items():
+            before = calibration_sample()
+            seconds = timer.timeit(numbers[key]) / numbers[key]
+            after = calibration_sample()
+            reference = min(before, after)
+            ratios[key].append(seconds / reference)
+            calibrations.append(reference)
+
+    calibration = statistics.median(calibrations)
+    return {key: statistics.median(values) * calibration for key, values in ratios.items()}, calibration
+
+
+def compare(current: Dict[str, float], calibration: float, baseline: Dict[str, Any], threshold: float) -> List[str]:
+    """Печатает сравнение с базой и возвращает список регрессий."""
+    scale = calibration / baseline["calibration"]
+    regressions = []
+    print(f"{'кейс':<44} {'база, мкс':>10} {'сейчас, мкс':>12} {'изм.':>8}")
+    for key, seconds in current.items():
+        base = baseline["results"].get(key)
+        if base is None:
+            print(f"{key:<44} {'-':>10} {seconds * 1e6:12.1f} {'новый':>8}")
+            continue
+        expected = base * scale
+        change = seconds / expected - 1
+        mark = ""
+        if change > threshold:
+            mark = "  <-- РЕГРЕССИЯ"
+            regressions.append(key)
+        print(f"{key:<44} {expected * 1e6:10.1f} {seconds * 1e6:12.1f} {change:+8.0%}{mark}")
+    return regressions
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Микробенчмарки горячих участков бота")
+    parser.add_argument("--baseline", default=DEFAULT_BASELINE, help="файл базы (JSON)")
+    parser.add_argument("--save", action="store_true", help="сохранить результаты как новую базу")
+    parser.add_argument("--threshold", type=float, default=DEFAULT_THRESHOLD, help="допустимое замедление (0.25 = 25%%)")
+    parser.add_argument("--filter", default="", help="запускать только кейсы, содержащие подстроку")
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+    # База сравнивается с каждым следующим прогоном, поэтому снимается тщательнее
+    current, calibration = run_suite(args.filter, ROUNDS * 2 if args.save else ROUNDS)
+
+    if args.save:
+        os.makedirs(os.path.dirname(args.baseline), exist_ok=True)
+        with open(args.baseline, "w", encoding="utf-8") as f:
+            json.dump({
+                "python": platform.python_version(),
+                "calibration": calibration,
+                "results": current
+            }, f, ensure_ascii=False, indent=2, sort_keys=True)
+        for key, seconds in current.items():
+            print(f"{key:<44} {seconds * 1e6:10.1f} мкс")
+        print(f"База сохранена: {args.baseline}")
+        return
+
+    if not os.path.exists(args.baseline):
+        for key, seconds in current.items():
+            print(f"{key:<44} {seconds * 1e6:10.1f} мкс")
+        print("База не найдена - запустите с --save")
+        return
+
+    with open(args.baseline, encoding="utf-8") as f:
+        baseline = json.load(f)
+
+    regressions = compare(current, calibration, baseline, args.threshold)
+    for attempt in range(CONFIRM_ATTEMPTS):
+        if not regressions:
+            break
+        # Одиночный выброс на шумной машине - еще не регрессия: перемеряем
+        print(f"Перемеряем ({attempt + 1}/{CONFIRM_ATTEMPTS}): {', '.join(regressions)}")
+        confirmed = []
+        for key in regressions:
+            seconds, calibration = run_suite(key)
+            confirmed += compare({key: seconds[key]}, calibration, baseline, args.threshold)
+        regressions = confirmed
+    if regressions:
+        print(f"Замедление больше {args.threshold:.0%}: {', '.join(regressions)}")
+        sys.exit(1)
+    print("Регрессий нет")
+
+
+if __name__ == "__main__":
+    main()
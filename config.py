@@ -8,17 +8,108 @@ BOT_TOKEN = os.getenv('BOT_TOKEN', 'YOUR_BOT_TOKEN_HERE')
 
 # TMDB API
 TMDB_API_KEY = os.getenv('TMDB_API_KEY', '8fd2a26ac2210a28d8e7f7315aa0aa1d')
-TMDB_BASE_URL = "https://api.themoviedb.org/3"
+TMDB_BASE_URL = os.getenv('TMDB_BASE_URL', 'https://api.themoviedb.org/3')
 
 # API Settings
 MAX_CONCURRENT_REQUESTS = 8
 MAX_RETRIES = 4
 BASE_RETRY_DELAY = 2
+TMDB_RATE_LIMIT_RPS = 40
+TMDB_RATE_LIMIT_BURST = 20
+TMDB_REQUEST_TIMEOUT = 10
+
+# Circuit breaker and hedged requests (per TMDB endpoint)
+BREAKER_FAILURE_THRESHOLD = 5
+BREAKER_RESET_TIMEOUT = 30
+TMDB_HEDGE_ENABLED = True
+TMDB_HEDGE_PERCENTILE = 0.95
+TMDB_HEDGE_MIN_SAMPLES = 20
+TMDB_HEDGE_MIN_DELAY = 0.05
+
+# HTTP connection pool
+HTTP_CONNECTION_LIMIT = 100
+HTTP_CONNECTION_LIMIT_PER_HOST = 30
+HTTP_KEEPALIVE_TIMEOUT = 30
+HTTP_DNS_CACHE_TTL = 300
+
+# TMDB response cache (TTL in seconds, first matching path fragment wins)
+TMDB_CACHE_MAX_BYTES = 64 * 1024 * 1024
+TMDB_CACHE_DEFAULT_TTL = 600
+TMDB_CACHE_TTL = {
+    "/genre/movie/list": 24 * 3600,
+    "/discover/movie": 10 * 60,
+    "/search/movie": 30 * 60,
+    "/movie/": 24 * 3600,
+}
+
+# Persistent (SQLite) cache tier shared by bot processes; empty path disables it
+TMDB_DISK_CACHE_PATH = os.getenv('TMDB_DISK_CACHE_PATH', 'tmdb_cache.sqlite3')
+TMDB_DISK_CACHE_COMPACT_INTERVAL = 600
+
+# Persistent FSM storage (SQLite): idle sessions expire, hot ones stay in memory
+FSM_STORAGE_PATH = os.getenv('FSM_STORAGE_PATH', 'fsm_storage.sqlite3')
+FSM_SESSION_TTL = 7 * 24 * 3600
+FSM_MEMORY_MAX_ENTRIES = 10000
+FSM_FLUSH_INTERVAL = 1.0
+FSM_CLEANUP_INTERVAL = 600
+FSM_COMPRESS_MIN_SIZE = 512
+
+# Local offline catalogue for discover queries (built by tools.build_catalog)
+LOCAL_CATALOG_PATH = os.getenv('LOCAL_CATALOG_PATH', 'movie_catalog.sqlite3')
+LOCAL_CATALOG_LANGUAGE = "ru-RU"
+LOCAL_CATALOG_MAX_AGE = 7 * 24 * 3600
+
+# Movie details: served instantly while stale, refreshed in the background
+DETAILS_FRESH_TTL = 3600
+DETAILS_STALE_TTL = 7 * 24 * 3600
+DETAILS_CACHE_MAX_ENTRIES = 5000
+PREFETCH_MAX_CONCURRENT = 2
+PREFETCH_RESERVE_TOKENS = 10
+PREFETCH_MAX_WAIT = 5
+
+# Progressive results: background loading with throttled in-place edits
+PROGRESSIVE_MAX_MOVIES = 200
+PROGRESSIVE_EDIT_INTERVAL = 1.5
+PROGRESSIVE_RESERVE_TOKENS = 10
+PROGRESSIVE_MAX_WAIT = 5
+
+# Genre catalogue
+GENRES_TTL = 6 * 3600
+GENRES_RETRY_INTERVAL = 30
+GENRES_WARMUP_LANGUAGES = ["ru-RU"]
 
 # Pagination
 MOVIES_PER_PAGE = 10
 MAX_PAGES_TO_SHOW = 50
 
+# Movie choice: fuzzy title matches offered as buttons
+MOVIE_CHOICE_CANDIDATES = 5
+MOVIE_CHOICE_MIN_SCORE = 0.3
+
+# Lazy loading of TMDB results
+TMDB_RESULTS_PER_PAGE = 20
+TMDB_READ_AHEAD_PAGES = 1
+RESULTS_TTL = 3600
+RESULTS_SHARE_MAX_AGE = 900
+MAX_STORED_RESULTS = 1000
+
+# Adaptive page budget for locally filtered searches
+SEARCH_MAX_PAGES_PER_STEP = 10
+SEARCH_MIN_SELECTIVITY = 0.05
+SEARCH_SELECTIVITY_ALPHA = 0.3
+
+# Query planner: below this learned selectivity a title search is topped up by discover
+PLANNER_MIN_SEARCH_SELECTIVITY = 0.2
+PLANNER_UNION_DISCOVER_PAGES = 5
+
+# Anti-flood: per-user token bucket, actions weighted by their TMDB cost
+THROTTLE_RATE = 1.0
+THROTTLE_BURST = 30
+THROTTLE_COST_SEARCH = 8
+THROTTLE_COST_AI = 8
+THROTTLE_COST_FETCH = 2
+THROTTLE_COST_DEFAULT = 1
+
 ai_service = AIRecommendationService()
 
 # Messages
@@ -42,6 +133,8 @@ MESSAGES = {
 
     'ask_movie_choice': '🎬 Введите название или ID фильма, который вас заинтересовал (для улучшения рекомендаций):',
     'movie_saved': '✅ Ваш выбор сохранен для персональных рекомендаций!',
+    'throttled': '⏳ Слишком много запросов. Подождите немного и попробуйте снова.',
+    'request_in_progress': '⏳ Предыдущий запрос еще выполняется, подождите...',
     'ai_recommendations': '🤖 <b>Персональные рекомендации на основе ваших предпочтений:</b>\n\n{recommendations}'
 }
 
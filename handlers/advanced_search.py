@@ -2,14 +2,14 @@ from aiogram import Router, F
 from aiogram.types import Message, CallbackQuery
 from aiogram.fsm.context import FSMContext
 
-from config import ai_service, MESSAGES, MOVIES_PER_PAGE
+from config import ai_service, MESSAGES
 from states.search_states import SimpleSearchStates, AdvancedSearchStates, MovieSelectionState
 from services.tmdb_api import TMDBApi
 from services.movie_service import MovieService
+from services.user_tasks import user_tasks
 from services.ai_service import AIRecommendationService
 from utils.formatters import (
-    format_movies_page, format_genre_selection, format_search_params,
-    format_error_message, format_movie_details
+    format_genre_selection, format_search_params, format_error_message
 )
 from keyboards.inline import (
     get_skip_button,
@@ -17,11 +17,8 @@ from keyboards.inline import (
     get_yes_no_keyboard,
     get_sort_options_keyboard,
     get_main_menu,
-    get_movie_selection_keyboard,
-    # Импортируем с алиасом, чтобы везде использовать короткое имя
-    get_pagination_with_movie_choice_keyboard as get_pagination_keyboard,
 )
-from keyboards.inline import get_pagination_with_movie_choice_keyboard
+from handlers.search import show_search_results, search_request
 
 
 
@@ -213,6 +210,9 @@ async def advanced_search_sort(callback: CallbackQuery, state: FSMContext):
 
 async def execute_advanced_search(message, state: FSMContext, edit: bool = False):
     """Выполнение расширенного поиска."""
+    user_id = state.key.user_id
+    # Новый поиск вытесняет всю незавершенную работу предыдущего
+    user_tasks.cancel(user_id)
     data = await state.get_data()
     
     # Показываем параметры поиска и индикатор загрузки
@@ -234,34 +234,8 @@ async def execute_advanced_search(message, state: FSMContext, edit: bool = False
     
     try:
         # Выполняем поиск
-        search_filters = {
-            'title': data.get('title'),
-            'genre_ids': data.get('genre_ids', []),
-            'year': data.get('year'),
-            'min_rating': data.get('min_rating'),
-            'language': data.get('language', 'ru-RU'),
-            'region': data.get('region'),
-            'include_adult': data.get('include_adult', False),
-            'sort_by': data.get('sort_by', 'popularity.desc')
-        }
-        
-        movies = await movie_service.search_movies_with_filters(search_filters)
-        
-        if not movies:
-            result_text = MESSAGES['no_movies_found']
-            keyboard = get_main_menu()
-        else:
-            # Сохраняем результаты и показываем первую страницу
-            await state.update_data(movies=movies, current_page=1)
-            total_pages = (len(movies) + MOVIES_PER_PAGE - 1) // MOVIES_PER_PAGE
-            
-            result_text = format_movies_page(movies, 1, MOVIES_PER_PAGE)
-            result_text += "\n\n💡 Выберите понравившийся фильм для персональных рекомендаций!"  # ДОБАВИТЬ
-            
-            # ЗАМЕНИТЬ НА НОВУЮ ФУНКЦИЮ клавиатуры
-            keyboard = get_pagination_with_movie_choice_keyboard(1, total_pages, "search_page")
-        
-        await message.edit_text(result_text, reply_markup=keyboard, parse_mode="HTML")
+        results_key, open_results = search_request(data)
+        await show_search_results(message, state, results_key, open_results)
             
     except Exception as e:
         print(f"[ERROR] Advanced search failed: {e}")
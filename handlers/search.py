@@ -1,11 +1,20 @@
 from aiogram import Router, F
 from aiogram.types import Message, CallbackQuery
 from aiogram.fsm.context import FSMContext
-from typing import List, Dict, Any
+from aiogram.types import InlineKeyboardMarkup
+from aiogram.exceptions import TelegramBadRequest
+from typing import List, Dict, Any, Tuple, Callable, Optional
 
-from config import ai_service, MESSAGES, MOVIES_PER_PAGE
+from config import ai_service, MESSAGES, MOVIES_PER_PAGE, MOVIE_CHOICE_CANDIDATES, MOVIE_CHOICE_MIN_SCORE
 from states.search_states import SimpleSearchStates, AdvancedSearchStates, MovieSelectionState
+from models.movie import Movie
 from services.tmdb_api import TMDBApi
+from services.movie_service import MovieService
+from services.result_source import LazySearchResults, search_results, query_key
+from services.prefetcher import details_prefetcher
+from services.results_refresher import results_refresher
+from services.user_tasks import user_tasks, TaskSuperseded
+from services.title_index import SUBSTRING_SCORE
 from services.ai_service import AIRecommendationService
 from utils.formatters import (
     format_movies_page, format_genre_selection, format_search_params,
@@ -14,11 +23,13 @@ from utils.formatters import (
 from keyboards.inline import (
     get_skip_button, get_genres_keyboard,
     get_yes_no_keyboard, get_sort_options_keyboard, get_main_menu,
-    get_movie_selection_keyboard, get_pagination_with_movie_choice_keyboard
+    get_movie_selection_keyboard, get_pagination_with_movie_choice_keyboard,
+    get_movie_candidates_keyboard
 )
 
 router = Router()
 tmdb_api = TMDBApi()
+movie_service = MovieService()
 
 
 # ===== ПРОСТОЙ ПОИСК =====
@@ -26,6 +37,7 @@ tmdb_api = TMDBApi()
 @router.callback_query(F.data == "simple_search")
 async def simple_search_start(callback: CallbackQuery, state: FSMContext):
     """Начало простого поиска."""
+    await reset_user_session(state)
     await state.set_state(SimpleSearchStates.waiting_for_title)
     await state.update_data(search_type="simple", title=None, genres=[], year=None)
     
@@ -54,8 +66,14 @@ async def simple_search_skip_title(callback: CallbackQuery, state: FSMContext):
 async def ask_for_genres(message, state: FSMContext, is_simple: bool = True, edit: bool = False):
     """Запрос жанров."""
     try:
-        genres_map = await tmdb_api.get_genres()
-        await state.update_data(genres_map=genres_map)
+        language = "ru-RU"
+        genres_map = await tmdb_api.get_genres(language)
+        if not genres_map:
+            await message.answer(format_error_message("api"), parse_mode="HTML")
+            return
+        
+        # В состоянии храним только язык: сами жанры берутся из общего каталога
+        await state.update_data(genres_language=language)
         
         next_state = SimpleSearchStates.waiting_for_genre if is_simple else AdvancedSearchStates.waiting_for_genres
         await state.set_state(next_state)
@@ -78,7 +96,7 @@ async def toggle_genre(callback: CallbackQuery, state: FSMContext):
     genre_id = int(callback.data.split("_")[1])
     data = await state.get_data()
     selected_genres = data.get("selected_genres", [])
-    genres_map = data.get("genres_map", {})
+    genres_map = await tmdb_api.get_genres(data.get("genres_language", "ru-RU"))
     
     if genre_id in selected_genres:
         selected_genres.remove(genre_id)
@@ -102,7 +120,7 @@ async def toggle_genre(callback: CallbackQuery, state: FSMContext):
 async def clear_genres(callback: CallbackQuery, state: FSMContext):
     """Очистка выбранных жанров."""
     data = await state.get_data()
-    genres_map = data.get("genres_map", {})
+    genres_map = await tmdb_api.get_genres(data.get("genres_language", "ru-RU"))
     
     await state.update_data(selected_genres=[])
     keyboard = get_genres_keyboard(genres_map, [])
@@ -123,7 +141,7 @@ async def genres_done(callback: CallbackQuery, state: FSMContext):
         return
     
     # Сохраняем названия жанров для отображения
-    genres_map = data.get("genres_map", {})
+    genres_map = await tmdb_api.get_genres(data.get("genres_language", "ru-RU"))
     genre_names = []
     for name, genre_id in genres_map.items():
         if genre_id in selected_genres:
@@ -173,6 +191,9 @@ async def simple_search_skip_year(callback: CallbackQuery, state: FSMContext):
 
 async def execute_simple_search(message, state: FSMContext, edit: bool = False):
     """Выполнение простого поиска."""
+    user_id = state.key.user_id
+    # Новый поиск вытесняет всю незавершенную работу предыдущего
+    user_tasks.cancel(user_id)
     data = await state.get_data()
     
     # Показываем индикатор загрузки
@@ -184,34 +205,11 @@ async def execute_simple_search(message, state: FSMContext, edit: bool = False):
             loading_msg = await message.answer(MESSAGES['loading'])
     
     try:
-        # Выполняем поиск
-        movies = await tmdb_api.search_movies(
-            title=data.get("title"),
-            genre_ids=data.get("genre_ids"),
-            year=data.get("year")
+        results_key, open_results = search_request(data)
+        await show_search_results(
+            message, state, results_key, open_results,
+            edit=edit, loading_msg=loading_msg
         )
-        
-        if not movies:
-            error_text = MESSAGES['no_movies_found']
-            keyboard = get_main_menu()
-        else:
-            # Сохраняем результаты и показываем первую страницу
-            await state.update_data(movies=movies, current_page=1)
-            total_pages = (len(movies) + MOVIES_PER_PAGE - 1) // MOVIES_PER_PAGE
-            
-            error_text = format_movies_page(movies, 1, MOVIES_PER_PAGE)
-            error_text += "\n\n💡 Выберите понравившийся фильм для персональных рекомендаций!"
-            
-            # Добавляем кнопку выбора фильма
-            keyboard = get_pagination_with_movie_choice_keyboard(1, total_pages, "search_page")
-        
-        if loading_msg:
-            await loading_msg.delete()
-        
-        if edit:
-            await message.edit_text(error_text, reply_markup=keyboard, parse_mode="HTML")
-        else:
-            await message.answer(error_text, reply_markup=keyboard, parse_mode="HTML")
             
     except Exception as e:
         if loading_msg:
@@ -232,6 +230,7 @@ async def execute_simple_search(message, state: FSMContext, edit: bool = False):
 @router.callback_query(F.data == "advanced_search")
 async def advanced_search_start(callback: CallbackQuery, state: FSMContext):
     """Начало расширенного поиска."""
+    await reset_user_session(state)
     await state.set_state(AdvancedSearchStates.waiting_for_title)
     await state.update_data(
         search_type="advanced", title=None, genres=[], year=None,
@@ -248,29 +247,202 @@ async def advanced_search_start(callback: CallbackQuery, state: FSMContext):
 
 # ===== ПАГИНАЦИЯ =====
 
+async def render_results_page(
+    results: LazySearchResults,
+    page: int,
+    with_hint: bool = True
+) -> Tuple[int, str, InlineKeyboardMarkup]:
+    """Формирует страницу результатов, подгружая недостающие страницы TMDB."""
+    await results.ensure(page * MOVIES_PER_PAGE)
+    
+    total_pages = results.total_pages(MOVIES_PER_PAGE)
+    page = max(1, min(page, total_pages))
+    
+    text = format_movies_page(
+        results.movies, page, MOVIES_PER_PAGE,
+        total_count=results.total_count,
+        is_estimate=not results.exhausted
+    )
+    if with_hint:
+        text += "\n\n💡 Выберите понравившийся фильм для персональных рекомендаций!"
+    
+    keyboard = get_pagination_with_movie_choice_keyboard(page, total_pages, "search_page")
+    return page, text, keyboard
+
+
+def prefetch_details(state: FSMContext, results: LazySearchResults, page: int, include_next: bool = False):
+    """Прогревает в фоне детали фильмов видимой (и следующей) страницы."""
+    start = (page - 1) * MOVIES_PER_PAGE
+    end = start + MOVIES_PER_PAGE * (2 if include_next else 1)
+    movie_ids = [movie.id for movie in results.movies[start:end]]
+    details_prefetcher.schedule(state.key.user_id, movie_ids, tmdb_api.get_movie_details)
+
+
+def refresh_results(
+    state: FSMContext,
+    results: LazySearchResults,
+    results_key: str,
+    sent: Message,
+    shown_text: str,
+    with_hint: bool = True
+):
+    """Догружает результаты в фоне, обновляя счетчик и число страниц в сообщении."""
+    if not isinstance(sent, Message):
+        return
+    
+    async def render():
+        data = await state.get_data()
+        if data.get("results_key") != results_key:
+            return None  # Пользователь уже начал другой поиск
+        _, text, keyboard = await render_results_page(results, data.get("current_page", 1), with_hint)
+        return text, keyboard
+    
+    async def edit(text: str, keyboard: InlineKeyboardMarkup):
+        try:
+            await sent.edit_text(text, reply_markup=keyboard, parse_mode="HTML")
+        except TelegramBadRequest:
+            pass  # Сообщение не изменилось или уже удалено
+    
+    results_refresher.schedule(state.key.user_id, results, shown_text, render, edit)
+
+
+def search_request(data: Dict[str, Any]) -> Tuple[str, Callable[[], LazySearchResults]]:
+    """Ключ набора результатов и функция, открывающая поиск, по параметрам из состояния."""
+    if data.get("search_type") == "advanced":
+        search_filters = {
+            'title': data.get('title'),
+            'genre_ids': data.get('genre_ids', []),
+            'year': data.get('year'),
+            'min_rating': data.get('min_rating'),
+            'language': data.get('language', 'ru-RU'),
+            'region': data.get('region'),
+            'include_adult': data.get('include_adult', False),
+            'sort_by': data.get('sort_by', 'popularity.desc')
+        }
+        return (
+            query_key(search_type="advanced", **search_filters),
+            lambda: movie_service.open_search(search_filters)
+        )
+    
+    search_params = {
+        "title": data.get("title"),
+        "genre_ids": data.get("genre_ids"),
+        "year": data.get("year")
+    }
+    return (
+        query_key(search_type="simple", **search_params),
+        lambda: tmdb_api.open_search(**search_params)
+    )
+
+
+async def user_results(state: FSMContext, data: Dict[str, Any]) -> Optional[LazySearchResults]:
+    """Текущий набор результатов пользователя или None.
+
+    Наборы живут только в памяти процесса, а состояние FSM переживает
+    перезапуск бота (и набор может истечь по TTL). Если набора по results_key
+    уже нет, поиск выполняется заново по параметрам из состояния
+    и догружается до текущей страницы.
+    """
+    results_key = data.get("results_key")
+    if not results_key:
+        return None
+    results = search_results.get(results_key, state.key.user_id)
+    if results is not None:
+        return results
+    
+    restored_key, open_results = search_request(data)
+    if restored_key != results_key:
+        return None  # Состояние от несовместимой версии бота
+    
+    user_id = state.key.user_id
+    results = search_results.acquire(user_id, results_key, open_results)
+    needed = data.get("current_page", 1) * MOVIES_PER_PAGE
+    try:
+        await user_tasks.run(user_id, user_tasks.SEARCH, results.ensure(needed))
+    except TaskSuperseded:
+        search_results.abandon(user_id)
+        return None
+    if not results.movies:
+        search_results.drop(user_id)
+        return None
+    return results
+
+
+async def show_search_results(
+    message: Message,
+    state: FSMContext,
+    results_key: str,
+    open_results: Callable[[], LazySearchResults],
+    edit: bool = True,
+    loading_msg: Optional[Message] = None
+):
+    """Выполняет поиск и показывает первую страницу результатов.
+
+    Страницы TMDB загружаются по мере пролистывания; одинаковые поиски
+    разных пользователей разделяют один набор результатов.
+    """
+    user_id = state.key.user_id
+    results = search_results.acquire(user_id, results_key, open_results)
+    try:
+        await user_tasks.run(user_id, user_tasks.SEARCH, results.ensure(MOVIES_PER_PAGE))
+    except TaskSuperseded:
+        # Пользователь уже ушел в меню или начал другой поиск
+        search_results.abandon(user_id)
+        if loading_msg:
+            await loading_msg.delete()
+        return
+    
+    if not results.movies:
+        search_results.drop(user_id)
+        text = MESSAGES['no_movies_found']
+        keyboard = get_main_menu()
+    else:
+        # В состоянии храним только ключ набора и текущую страницу
+        await state.update_data(results_key=results_key, current_page=1)
+        
+        _, text, keyboard = await render_results_page(results, 1)
+        prefetch_details(state, results, 1)
+    
+    if loading_msg:
+        await loading_msg.delete()
+    
+    if edit:
+        sent = await message.edit_text(text, reply_markup=keyboard, parse_mode="HTML")
+    else:
+        sent = await message.answer(text, reply_markup=keyboard, parse_mode="HTML")
+    
+    if results.movies:
+        refresh_results(state, results, results_key, sent, text)
+
+
+async def reset_user_session(state: FSMContext):
+    """Завершает сессию пользователя: фоновые задачи, набор результатов и состояние."""
+    user_id = state.key.user_id
+    user_tasks.cancel(user_id)
+    search_results.release(user_id)
+    await state.clear()
+
+
 @router.callback_query(F.data.startswith("search_page_"))
 async def search_pagination(callback: CallbackQuery, state: FSMContext):
     """Пагинация результатов поиска."""
     page = int(callback.data.split("_")[2])
     data = await state.get_data()
-    movies = data.get("movies", [])
+    results = await user_results(state, data)
     
-    if not movies:
+    if not results or not results.movies:
         await callback.answer("Результаты поиска не найдены")
         return
     
-    total_pages = (len(movies) + MOVIES_PER_PAGE - 1) // MOVIES_PER_PAGE
-    
-    if 1 <= page <= total_pages:
+    if page >= 1:
+        page, text, keyboard = await render_results_page(results, page)
         await state.update_data(current_page=page)
+        prefetch_details(state, results, page, include_next=True)
         
-        text = format_movies_page(movies, page, MOVIES_PER_PAGE)
-        text += "\n\n💡 Выберите понравившийся фильм для персональных рекомендаций!"  # ДОБАВИТЬ
-        
-        # ЗАМЕНИТЬ НА НОВУЮ ФУНКЦИЮ клавиатуры
-        keyboard = get_pagination_with_movie_choice_keyboard(page, total_pages, "search_page")
-        
-        await callback.message.edit_text(text, reply_markup=keyboard, parse_mode="HTML")
+        try:
+            await callback.message.edit_text(text, reply_markup=keyboard, parse_mode="HTML")
+        except:
+            pass  # Игнорируем если сообщение не изменилось
     
     await callback.answer()
 
@@ -278,7 +450,7 @@ async def search_pagination(callback: CallbackQuery, state: FSMContext):
 @router.callback_query(F.data == "new_search")
 async def new_search(callback: CallbackQuery, state: FSMContext):
     """Начать новый поиск."""
-    await state.clear()
+    await reset_user_session(state)
     await callback.message.edit_text(
         MESSAGES['start'],
         reply_markup=get_main_menu(),
@@ -291,6 +463,8 @@ async def new_search(callback: CallbackQuery, state: FSMContext):
 async def show_movie_details(callback: CallbackQuery, state: FSMContext):
     """Показать детальную информацию о фильме."""
     movie_id = int(callback.data.split("_")[1])
+    # Сообщение с результатами сейчас заменится деталями фильма
+    results_refresher.cancel(callback.from_user.id)
     
     try:
         movie_details = await tmdb_api.get_movie_details(movie_id)
@@ -315,10 +489,10 @@ async def show_movie_details(callback: CallbackQuery, state: FSMContext):
 async def back_to_results(callback: CallbackQuery, state: FSMContext):
     """Возврат к результатам поиска."""
     data = await state.get_data()
-    movies = data.get("movies", [])
+    results = await user_results(state, data)
     current_page = data.get("current_page", 1)
     
-    if not movies:
+    if not results or not results.movies:
         await callback.message.edit_text(
             MESSAGES['start'],
             reply_markup=get_main_menu(),
@@ -326,11 +500,11 @@ async def back_to_results(callback: CallbackQuery, state: FSMContext):
         )
         return
     
-    total_pages = (len(movies) + MOVIES_PER_PAGE - 1) // MOVIES_PER_PAGE
-    text = format_movies_page(movies, current_page, MOVIES_PER_PAGE)
-    keyboard = get_pagination_with_movie_choice_keyboard(current_page, total_pages, "search_page")
+    _, text, keyboard = await render_results_page(results, current_page, with_hint=False)
+    prefetch_details(state, results, current_page)
     
-    await callback.message.edit_text(text, reply_markup=keyboard, parse_mode="HTML")
+    sent = await callback.message.edit_text(text, reply_markup=keyboard, parse_mode="HTML")
+    refresh_results(state, results, data.get("results_key"), sent, text, with_hint=False)
     await callback.answer()
 
 
@@ -341,7 +515,9 @@ async def show_ai_recommendations(callback: CallbackQuery, state: FSMContext):
     
     try:
         genres_map = await tmdb_api.get_genres()
-        recommendations = await ai_service.get_ai_recommendations(user_id, genres_map)
+        recommendations = await user_tasks.run(
+            user_id, user_tasks.AI, ai_service.get_ai_recommendations(user_id, genres_map)
+        )
         
         text = MESSAGES['ai_recommendations'].format(recommendations=recommendations)
         await callback.message.edit_text(
@@ -349,6 +525,8 @@ async def show_ai_recommendations(callback: CallbackQuery, state: FSMContext):
             reply_markup=get_main_menu(),
             parse_mode="HTML"
         )
+    except TaskSuperseded:
+        pass  # Пользователь уже ушел, ответ больше не нужен
     except Exception as e:
         print(f"[ERROR] AI recommendations failed: {e}")
         await callback.message.edit_text(
@@ -362,6 +540,7 @@ async def show_ai_recommendations(callback: CallbackQuery, state: FSMContext):
 @router.callback_query(F.data == "ask_movie_choice")
 async def ask_movie_choice(callback: CallbackQuery, state: FSMContext):
     """Запрос выбора фильма пользователем."""
+    results_refresher.cancel(callback.from_user.id)
     await state.set_state(MovieSelectionState.waiting_for_movie_choice)
     
     await callback.message.edit_text(
@@ -379,8 +558,8 @@ async def process_movie_choice(message: Message, state: FSMContext):
     
     try:
         data = await state.get_data()
-        movies = data.get("movies", [])
-        selected_genres = data.get("genre_ids", [])
+        results = await user_results(state, data)
+        index = results.title_index() if results else None
         
         # Ищем фильм по названию или ID
         selected_movie = None
@@ -388,23 +567,31 @@ async def process_movie_choice(message: Message, state: FSMContext):
         if choice.isdigit():
             # Поиск по ID в списке результатов
             movie_id = int(choice)
-            selected_movie = next((m for m in movies if m.get("id") == movie_id), None)
+            selected_movie = index.by_id(movie_id) if index else None
             
             # Если не найден в списке, попробуем получить из API
             if not selected_movie:
-                selected_movie = await tmdb_api.get_movie_details(movie_id)
-        else:
-            # Поиск по названию
-            choice_lower = choice.lower()
-            selected_movie = next(
-                (m for m in movies if choice_lower in m.get("title", "").lower() or 
-                 choice_lower in m.get("original_title", "").lower()), 
-                None
-            )
+                details = await tmdb_api.get_movie_details(movie_id)
+                selected_movie = Movie.from_tmdb(details) if details else None
+        elif index:
+            # Нечеткий поиск по названию
+            matches = index.search(choice, limit=MOVIE_CHOICE_CANDIDATES, min_score=MOVIE_CHOICE_MIN_SCORE)
+            if matches:
+                best_score, best_movie = matches[0]
+                # Однозначное совпадение выбираем сразу, иначе предлагаем варианты
+                if best_score >= SUBSTRING_SCORE and (len(matches) == 1 or matches[1][0] < best_score):
+                    selected_movie = best_movie
+                else:
+                    await message.answer(
+                        "🔎 Возможно, вы имели в виду один из этих фильмов:",
+                        reply_markup=get_movie_candidates_keyboard([movie for _, movie in matches]),
+                        parse_mode="HTML"
+                    )
+                    return
         
         if selected_movie:
             # Сохраняем предпочтения пользователя
-            ai_service.save_user_preference(user_id, selected_genres, selected_movie)
+            ai_service.save_user_preference(user_id, data.get("genre_ids", []), selected_movie)
             
             await message.answer(
                 MESSAGES['movie_saved'],
@@ -427,12 +614,41 @@ async def process_movie_choice(message: Message, state: FSMContext):
             parse_mode="HTML"
         )
     
-    await state.clear()
+    await reset_user_session(state)
+
+
+@router.callback_query(F.data.startswith("choose_movie_"), MovieSelectionState.waiting_for_movie_choice)
+async def choose_movie_candidate(callback: CallbackQuery, state: FSMContext):
+    """Выбор фильма из предложенных вариантов."""
+    user_id = callback.from_user.id
+    movie_id = int(callback.data.split("_")[2])
+    
+    data = await state.get_data()
+    results = await user_results(state, data)
+    selected_movie = results.title_index().by_id(movie_id) if results else None
+    
+    if not selected_movie:
+        details = await tmdb_api.get_movie_details(movie_id)
+        selected_movie = Movie.from_tmdb(details) if details else None
+    
+    if not selected_movie:
+        await callback.answer("Не удалось найти фильм", show_alert=True)
+        return
+    
+    ai_service.save_user_preference(user_id, data.get("genre_ids", []), selected_movie)
+    await reset_user_session(state)
+    
+    await callback.message.edit_text(
+        MESSAGES['movie_saved'],
+        reply_markup=get_main_menu(),
+        parse_mode="HTML"
+    )
+    await callback.answer()
 
 @router.callback_query(F.data == "skip_movie_choice")
 async def skip_movie_choice(callback: CallbackQuery, state: FSMContext):
     """Пропуск выбора фильма."""
-    await state.clear()
+    await reset_user_session(state)
     await callback.message.edit_text(
         MESSAGES['start'],
         reply_markup=get_main_menu(),
@@ -6,6 +6,7 @@ from aiogram.fsm.context import FSMContext
 from keyboards.inline import get_main_menu
 from utils.formatters import format_help_message
 from config import MESSAGES
+from handlers.search import reset_user_session
 
 router = Router()
 
@@ -13,7 +14,7 @@ router = Router()
 @router.message(Command("start"))
 async def start_command(message: Message, state: FSMContext):
     """Обработчик команды /start."""
-    await state.clear()  # Очищаем состояние
+    await reset_user_session(state)  # Очищаем состояние
     
     await message.answer(
         MESSAGES['start'],
@@ -25,7 +26,7 @@ async def start_command(message: Message, state: FSMContext):
 @router.callback_query(F.data == "main_menu")
 async def main_menu_callback(callback: CallbackQuery, state: FSMContext):
     """Возврат в главное меню."""
-    await state.clear()
+    await reset_user_session(state)
     
     await callback.message.edit_text(
         MESSAGES['start'],
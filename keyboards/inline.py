@@ -1,6 +1,8 @@
 from aiogram.types import InlineKeyboardMarkup, InlineKeyboardButton
 from typing import List, Dict, Any
 
+from models.movie import Movie
+
 
 def get_main_menu() -> InlineKeyboardMarkup:
     """Главное меню выбора типа поиска."""
@@ -29,6 +31,21 @@ def get_movie_selection_keyboard() -> InlineKeyboardMarkup:
     return InlineKeyboardMarkup(inline_keyboard=keyboard)
 
 
+def get_movie_candidates_keyboard(movies: List[Movie]) -> InlineKeyboardMarkup:
+    """Кнопки с похожими фильмами, если название введено неточно."""
+    keyboard = []
+    for movie in movies:
+        year = f" ({movie.release_date[:4]})" if movie.release_date else ""
+        keyboard.append([InlineKeyboardButton(
+            text=f"🎬 {movie.title[:50]}{year}",
+            callback_data=f"choose_movie_{movie.id}"
+        )])
+    
+    keyboard.append([InlineKeyboardButton(text="⏭ Пропустить", callback_data="skip_movie_choice")])
+    keyboard.append([InlineKeyboardButton(text="🏠 Главное меню", callback_data="main_menu")])
+    return InlineKeyboardMarkup(inline_keyboard=keyboard)
+
+
 def get_genres_keyboard(genres: Dict[str, int], selected: List[int] = None) -> InlineKeyboardMarkup:
     """Клавиатура выбора жанров."""
     if selected is None:
@@ -1,13 +1,22 @@
 import asyncio
 import logging
+from typing import Optional
 from aiogram import Bot, Dispatcher
 from aiogram.fsm.storage.memory import MemoryStorage
+from aiogram.fsm.storage.base import BaseStorage
 
 
-from config import BOT_TOKEN
+from config import BOT_TOKEN, GENRES_WARMUP_LANGUAGES, FSM_STORAGE_PATH
 from config import ai_service
 from handlers import start, search
 from handlers.advanced_search import router as advanced_router
+from middlewares.throttling import ThrottlingMiddleware
+from services.http_session import init_session, close_session
+from services.persistent_cache import tmdb_disk_cache
+from services.details_cache import movie_details_cache
+from services.fsm_storage import SQLiteStorage
+from services.local_catalog import local_catalog
+from services.user_tasks import user_tasks
 
 # Настройка логирования
 logging.basicConfig(
@@ -17,18 +26,53 @@ logging.basicConfig(
 logger = logging.getLogger(__name__)
 
 
-async def main():
-    """Основная функция запуска бота."""
-    # Создаем бота и диспетчер
-    bot = Bot(token=BOT_TOKEN)
-    storage = MemoryStorage()
-    dp = Dispatcher(storage=storage)
+async def on_startup():
+    """Инициализация общих ресурсов при запуске."""
+    await init_session()
+    tmdb_disk_cache.start()
+    search.tmdb_api.warm_up_genres(GENRES_WARMUP_LANGUAGES)
+
+
+async def on_shutdown():
+    """Освобождение общих ресурсов при остановке."""
+    await user_tasks.close()
+    await movie_details_cache.close()
+    await close_session()
+    await tmdb_disk_cache.close()
+    local_catalog.close()
+
+
+def create_dispatcher(storage: Optional[BaseStorage] = None) -> Dispatcher:
+    """Создает диспетчер с роутерами и хуками жизненного цикла."""
+    dp = Dispatcher(storage=storage or MemoryStorage())
     
     # Регистрируем роутеры
     dp.include_router(start.router)
     dp.include_router(search.router)
     dp.include_router(advanced_router)
     
+    # Защита от флуда: общая корзина токенов пользователя на сообщения и кнопки
+    throttling = ThrottlingMiddleware()
+    dp.message.outer_middleware(throttling)
+    dp.callback_query.outer_middleware(throttling)
+    
+    # Жизненный цикл общих ресурсов
+    dp.startup.register(on_startup)
+    dp.shutdown.register(on_shutdown)
+    if isinstance(dp.storage, SQLiteStorage):
+        # Закрывает хранилище сам диспетчер при остановке
+        dp.startup.register(dp.storage.start)
+    return dp
+
+
+async def main():
+    """Основная функция запуска бота."""
+    # Создаем бота и диспетчер
+    bot = Bot(token=BOT_TOKEN)
+    # Состояния пользователей хранятся на диске и переживают перезапуск
+    storage = SQLiteStorage(FSM_STORAGE_PATH) if FSM_STORAGE_PATH else None
+    dp = create_dispatcher(storage)
+    
     # Запускаем поллинг
     try:
         logger.info("🚀 Бот запускается...")
@@ -0,0 +1,151 @@
+import time
+from collections import Counter, OrderedDict
+from typing import Any, Awaitable, Callable, Dict, Optional, Set, Tuple
+from aiogram import BaseMiddleware
+from aiogram.types import CallbackQuery, Message, TelegramObject
+from config import (
+    MESSAGES,
+    THROTTLE_RATE,
+    THROTTLE_BURST,
+    THROTTLE_COST_SEARCH,
+    THROTTLE_COST_AI,
+    THROTTLE_COST_FETCH,
+    THROTTLE_COST_DEFAULT
+)
+from states.search_states import SimpleSearchStates, MovieSelectionState
+
+
+Handler = Callable[[TelegramObject, Dict[str, Any]], Awaitable[Any]]
+
+SEARCH = "search"
+AI = "ai"
+FETCH = "fetch"
+DEFAULT = "default"
+
+# Дорогие действия, которые у пользователя не могут выполняться дважды одновременно
+EXCLUSIVE_KINDS = (SEARCH, AI)
+
+# Кнопки, которые подгружают данные из TMDB
+FETCH_CALLBACK_PREFIXES = ("search_page_", "details_", "back_to_results", "choose_movie_")
+
+
+class _Bucket:
+    __slots__ = ("tokens", "updated", "warned")
+
+    def __init__(self, tokens: float, now: float):
+        self.tokens = tokens
+        self.updated = now
+        self.warned = False
+
+
+class ThrottlingMiddleware(BaseMiddleware):
+    """Защита от флуда: у каждого пользователя своя корзина токенов.
+
+    Действие стоит тем больше, чем больше запросов к TMDB оно вызывает:
+    поиск и AI-рекомендации дороже пагинации, а та - дороже переключения
+    жанров. Повторный поиск, пока предыдущий еще выполняется (двойное
+    нажатие), отбрасывается без списания токенов.
+    """
+
+    def __init__(
+        self,
+        rate: float = THROTTLE_RATE,
+        burst: float = THROTTLE_BURST,
+        costs: Optional[Dict[str, float]] = None
+    ):
+        self.rate = rate
+        self.burst = burst
+        self.costs = costs or {
+            SEARCH: THROTTLE_COST_SEARCH,
+            AI: THROTTLE_COST_AI,
+            FETCH: THROTTLE_COST_FETCH,
+            DEFAULT: THROTTLE_COST_DEFAULT,
+        }
+        # Порядок по времени последнего действия: в начале - давно молчащие
+        self._buckets: "OrderedDict[int, _Bucket]" = OrderedDict()
+        self._in_flight: Set[Tuple[int, str]] = set()
+        self.throttled = Counter()
+        self.duplicates = Counter()
+
+    @staticmethod
+    def classify(event: TelegramObject, raw_state: Optional[str]) -> str:
+        """Определяет вид действия по апдейту и текущему состоянию FSM."""
+        if isinstance(event, CallbackQuery):
+            data = event.data or ""
+            if data == "sort_done" or (data == "skip" and raw_state == SimpleSearchStates.waiting_for_year.state):
+                return SEARCH
+            if data == "ai_recommendations":
+                return AI
+            if data.startswith(FETCH_CALLBACK_PREFIXES):
+                return FETCH
+        elif isinstance(event, Message):
+            if raw_state == SimpleSearchStates.waiting_for_year.state:
+                return SEARCH
+            if raw_state == MovieSelectionState.waiting_for_movie_choice.state:
+                return FETCH
+        return DEFAULT
+
+    def _bucket(self, user_id: int, now: float) -> _Bucket:
+        # Корзины тех, кто молчал дольше полного пополнения, снова полные - их можно забыть
+        idle = self.burst / self.rate
+        while self._buckets:
+            oldest = next(iter(self._buckets.values()))
+            if now - oldest.updated < idle:
+                break
+            self._buckets.popitem(last=False)
+
+        bucket = self._buckets.get(user_id)
+        if bucket is None:
+            bucket = self._buckets[user_id] = _Bucket(self.burst, now)
+        else:
+            self._buckets.move_to_end(user_id)
+            bucket.tokens = min(self.burst, bucket.tokens + (now - bucket.updated) * self.rate)
+            bucket.updated = now
+        return bucket
+
+    def try_spend(self, user_id: int, cost: float) -> bool:
+        """Списывает cost токенов; False - пользователь превысил лимит."""
+        bucket = self._bucket(user_id, time.monotonic())
+        if bucket.tokens < cost:
+            return False
+        bucket.tokens -= cost
+        bucket.warned = False
+        return True
+
+    async def _reject(self, event: TelegramObject, user_id: int, text: str):
+        if isinstance(event, CallbackQuery):
+            await event.answer(text)
+            return
+        # На сообщения отвечаем один раз, пока лимит не восстановится
+        bucket = self._buckets.get(user_id)
+        if bucket is not None and not bucket.warned:
+            bucket.warned = True
+            await event.answer(text)
+
+    async def __call__(self, handler: Handler, event: TelegramObject, data: Dict[str, Any]) -> Any:
+        user = getattr(event, "from_user", None)
+        if user is None:
+            return await handler(event, data)
+
+        kind = self.classify(event, data.get("raw_state"))
+        key = (user.id, kind)
+
+        if key in self._in_flight:
+            self.duplicates[kind] += 1
+            if isinstance(event, CallbackQuery):
+                await event.answer(MESSAGES['request_in_progress'])
+            return None
+
+        if not self.try_spend(user.id, self.costs[kind]):
+            self.throttled[kind] += 1
+            await self._reject(event, user.id, MESSAGES['throttled'])
+            return None
+
+        if kind not in EXCLUSIVE_KINDS:
+            return await handler(event, data)
+
+        self._in_flight.add(key)
+        try:
+            return await handler(event, data)
+        finally:
+            self._in_flight.discard(key)
@@ -0,0 +1,67 @@
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+
+class Movie:
+    """Компактная запись о фильме из результатов поиска.
+
+    Хранит только поля, нужные для списков, фильтров и сортировки; остальной
+    JSON ответа TMDB (описание, фоны и т.п.) отбрасывается при получении.
+    """
+
+    __slots__ = (
+        "id", "title", "original_title", "release_date",
+        "vote_average", "vote_count", "popularity", "poster_path", "genre_ids"
+    )
+
+    def __init__(
+        self,
+        id: int,
+        title: str = "Без названия",
+        original_title: str = "",
+        release_date: str = "",
+        vote_average: float = 0.0,
+        vote_count: int = 0,
+        popularity: float = 0.0,
+        poster_path: Optional[str] = None,
+        genre_ids: Tuple[int, ...] = ()
+    ):
+        self.id = id
+        self.title = title
+        self.original_title = original_title
+        self.release_date = release_date
+        self.vote_average = vote_average
+        self.vote_count = vote_count
+        self.popularity = popularity
+        self.poster_path = poster_path
+        self.genre_ids = genre_ids
+
+    @classmethod
+    def from_tmdb(cls, data: Dict[str, Any]) -> "Movie":
+        """Создает запись из JSON TMDB (результат поиска или детали фильма)."""
+        genre_ids = data.get("genre_ids")
+        if genre_ids is None:
+            genre_ids = [g["id"] for g in data.get("genres", [])]
+
+        return cls(
+            id=data.get("id"),
+            title=data.get("title") or "Без названия",
+            original_title=data.get("original_title") or "",
+            release_date=data.get("release_date") or "",
+            vote_average=data.get("vote_average") or 0.0,
+            vote_count=data.get("vote_count") or 0,
+            popularity=data.get("popularity") or 0.0,
+            poster_path=data.get("poster_path"),
+            genre_ids=tuple(genre_ids)
+        )
+
+    def to_dict(self) -> Dict[str, Any]:
+        """Словарь с полями записи (в формате TMDB)."""
+        return {name: getattr(self, name) for name in self.__slots__}
+
+    def __repr__(self) -> str:
+        return f"Movie(id={self.id!r}, title={self.title!r})"
+
+
+def project_movies(results: Iterable[Dict[str, Any]]) -> List[Movie]:
+    """Превращает результаты TMDB в компактные записи, пропуская фильмы без id."""
+    return [Movie.from_tmdb(data) for data in results if data.get("id")]
@@ -2,6 +2,8 @@ import g4f
 import json
 from typing import Dict, List, Any, Optional
 
+from models.movie import Movie
+
 
 class AIRecommendationService:
     """Сервис для AI-рекомендаций фильмов."""
@@ -9,7 +11,7 @@ class AIRecommendationService:
     def __init__(self):
         self.user_preferences = {}  # В реальном проекте использовать БД
     
-    def save_user_preference(self, user_id: int, genre_ids: List[int], selected_movie: Dict[str, Any]):
+    def save_user_preference(self, user_id: int, genre_ids: List[int], selected_movie: Movie):
         """Сохраняет предпочтения пользователя."""
         if user_id not in self.user_preferences:
             self.user_preferences[user_id] = {
@@ -23,10 +25,10 @@ class AIRecommendationService:
         
         # Добавляем фильм
         self.user_preferences[user_id]['selected_movies'].append({
-            'id': selected_movie.get('id'),
-            'title': selected_movie.get('title'),
-            'genres': selected_movie.get('genre_ids', []),
-            'rating': selected_movie.get('vote_average')
+            'id': selected_movie.id,
+            'title': selected_movie.title,
+            'genres': list(selected_movie.genre_ids),
+            'rating': selected_movie.vote_average
         })
         
         # Обновляем частоту жанров
@@ -0,0 +1,99 @@
+import asyncio
+import time
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, Hashable, Optional, Set, Tuple
+from config import (
+    DETAILS_FRESH_TTL,
+    DETAILS_STALE_TTL,
+    DETAILS_CACHE_MAX_ENTRIES
+)
+from services.singleflight import SingleFlight
+
+
+# loader(refresh) - при refresh=True общие кэши ответов должны обходиться
+DetailsLoader = Callable[[bool], Awaitable[Optional[Dict[str, Any]]]]
+
+
+class DetailsCache:
+    """Кэш деталей фильмов по схеме stale-while-revalidate.
+
+    Свежая запись отдается как есть, устаревшая - сразу, с обновлением в фоне.
+    На каждый ключ одновременно выполняется не больше одной загрузки;
+    загрузка, которую перестали ждать все (отмененный прогрев), отменяется.
+    """
+
+    def __init__(
+        self,
+        fresh_ttl: float = DETAILS_FRESH_TTL,
+        stale_ttl: float = DETAILS_STALE_TTL,
+        max_entries: int = DETAILS_CACHE_MAX_ENTRIES
+    ):
+        self.fresh_ttl = fresh_ttl
+        self.stale_ttl = stale_ttl
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[Hashable, Tuple[float, Dict[str, Any]]]" = OrderedDict()
+        self._flight = SingleFlight()
+        self._refreshes: Set[asyncio.Task] = set()
+        self.hits = 0
+        self.stale_hits = 0
+        self.misses = 0
+
+    async def get(self, key: Hashable, loader: DetailsLoader) -> Optional[Dict[str, Any]]:
+        """Возвращает детали из кэша или загружает их."""
+        entry = self._entries.get(key)
+        if entry is not None:
+            fetched_at, data = entry
+            age = time.monotonic() - fetched_at
+
+            if age < self.fresh_ttl:
+                self.hits += 1
+                self._entries.move_to_end(key)
+                return data
+
+            if age < self.stale_ttl:
+                self.stale_hits += 1
+                self._entries.move_to_end(key)
+                self._start_refresh(key, loader)
+                return data
+
+        self.misses += 1
+        return await self._flight.do(key, lambda: self._load(key, loader, refresh=False))
+
+    def _start_refresh(self, key: Hashable, loader: DetailsLoader):
+        """Обновляет запись в фоне, если загрузка еще не идет (защита от лавины запросов)."""
+        if self._flight.running(key):
+            return
+        # Фоновая задача сама ждет загрузку, поэтому та не отменится вместе с чужими ожиданиями
+        task = asyncio.create_task(self._flight.do(key, lambda: self._load(key, loader, refresh=True)))
+        self._refreshes.add(task)
+        task.add_done_callback(self._refreshes.discard)
+
+    async def _load(self, key: Hashable, loader: DetailsLoader, refresh: bool) -> Optional[Dict[str, Any]]:
+        """Загружает детали и сохраняет их; при ошибке старая запись остается."""
+        try:
+            data = await loader(refresh)
+        except Exception as e:
+            print(f"[ERROR] Movie details refresh failed: {e}")
+            data = None
+
+        if data:
+            self._store(key, data)
+            return data
+
+        entry = self._entries.get(key)
+        return entry[1] if entry else data
+
+    def _store(self, key: Hashable, data: Dict[str, Any]):
+        """Сохраняет запись, вытесняя самые старые при переполнении."""
+        self._entries[key] = (time.monotonic(), data)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    async def close(self):
+        """Отменяет фоновые обновления."""
+        await self._flight.close()
+        await asyncio.gather(*self._refreshes, return_exceptions=True)
+
+
+movie_details_cache = DetailsCache()
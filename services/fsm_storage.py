@@ -0,0 +1,255 @@
+import asyncio
+import sqlite3
+import threading
+import time
+import zlib
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Tuple
+from aiogram.fsm.state import State
+from aiogram.fsm.storage.base import BaseStorage, StateType, StorageKey
+from services import json_codec
+from config import (
+    FSM_STORAGE_PATH,
+    FSM_SESSION_TTL,
+    FSM_MEMORY_MAX_ENTRIES,
+    FSM_FLUSH_INTERVAL,
+    FSM_CLEANUP_INTERVAL,
+    FSM_COMPRESS_MIN_SIZE
+)
+
+
+# Первый байт сериализованных данных: сжатый или обычный JSON
+_PLAIN = b"j"
+_COMPRESSED = b"z"
+
+
+def encode_data(data: Dict[str, Any], compress_min_size: int = FSM_COMPRESS_MIN_SIZE) -> bytes:
+    """Компактная бинарная запись данных FSM (JSON, крупные записи сжимаются)."""
+    raw = json_codec.dumps(data)
+    if len(raw) >= compress_min_size:
+        return _COMPRESSED + zlib.compress(raw)
+    return _PLAIN + raw
+
+
+def decode_data(blob: bytes) -> Dict[str, Any]:
+    if blob[:1] == _COMPRESSED:
+        return json_codec.loads(zlib.decompress(blob[1:]))
+    return json_codec.loads(blob[1:])
+
+
+class _Session:
+    __slots__ = ("state", "data", "used_at", "dirty")
+
+    def __init__(self, state: Optional[str] = None, data: Optional[Dict[str, Any]] = None):
+        self.state = state
+        self.data = data if data is not None else {}
+        self.used_at = time.monotonic()
+        self.dirty = False
+
+    @property
+    def empty(self) -> bool:
+        return self.state is None and not self.data
+
+
+class SQLiteStorage(BaseStorage):
+    """Хранилище состояний FSM в SQLite с ограниченным кэшем в памяти.
+
+    В памяти держатся только недавно активные сессии (LRU до max_entries),
+    остальные читаются из файла по требованию. Изменения пишутся на диск
+    пачками раз в flush_interval секунд и при остановке, поэтому сессии
+    переживают перезапуск. Сессии, которые не менялись дольше ttl, удаляются,
+    пустые (после state.clear()) в файле не хранятся.
+
+    Наборы результатов поиска (search_results) живут только в памяти:
+    после перезапуска results_key в сессии указывает в пустоту, и обработчики
+    выполняют поиск заново по сохраненным параметрам (handlers.search.user_results).
+    """
+
+    def __init__(
+        self,
+        path: str = FSM_STORAGE_PATH,
+        ttl: float = FSM_SESSION_TTL,
+        max_entries: int = FSM_MEMORY_MAX_ENTRIES,
+        flush_interval: float = FSM_FLUSH_INTERVAL,
+        cleanup_interval: float = FSM_CLEANUP_INTERVAL
+    ):
+        self.path = path
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.flush_interval = flush_interval
+        self.cleanup_interval = cleanup_interval
+        self._sessions: "OrderedDict[str, _Session]" = OrderedDict()
+        self._conn: Optional[sqlite3.Connection] = None
+        self._lock = threading.Lock()
+        self._flush_task: Optional[asyncio.Task] = None
+        self.loads = 0
+        self.flushes = 0
+
+    @staticmethod
+    def _key(key: StorageKey) -> str:
+        return f"{key.bot_id}:{key.chat_id}:{key.user_id}:{key.thread_id or ''}:{key.destiny}"
+
+    def _connect(self) -> sqlite3.Connection:
+        """Открывает базу при первом обращении."""
+        if self._conn is None:
+            conn = sqlite3.connect(self.path, timeout=5, isolation_level=None, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS fsm ("
+                "key TEXT PRIMARY KEY, state TEXT, data BLOB NOT NULL, updated_at REAL NOT NULL)"
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS fsm_updated_at ON fsm (updated_at)")
+            self._conn = conn
+        return self._conn
+
+    # ===== Диск =====
+
+    def _load_sync(self, key: str) -> Optional[Tuple[Optional[str], bytes]]:
+        with self._lock:
+            return self._connect().execute(
+                "SELECT state, data FROM fsm WHERE key = ? AND updated_at > ?",
+                (key, time.time() - self.ttl)
+            ).fetchone()
+
+    def _write_sync(self, upserts: List[Tuple[str, Optional[str], bytes]], deletes: List[str]):
+        now = time.time()
+        with self._lock:
+            conn = self._connect()
+            conn.execute("BEGIN")
+            try:
+                conn.executemany(
+                    "INSERT OR REPLACE INTO fsm (key, state, data, updated_at) VALUES (?, ?, ?, ?)",
+                    [(key, state, data, now) for key, state, data in upserts]
+                )
+                conn.executemany("DELETE FROM fsm WHERE key = ?", [(key,) for key in deletes])
+                conn.execute("COMMIT")
+            except Exception:
+                conn.execute("ROLLBACK")
+                raise
+
+    def cleanup(self) -> int:
+        """Удаляет из файла сессии, которые не менялись дольше ttl."""
+        with self._lock:
+            conn = self._connect()
+            deleted = conn.execute(
+                "DELETE FROM fsm WHERE updated_at <= ?", (time.time() - self.ttl,)
+            ).rowcount
+            conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+        return deleted
+
+    async def flush(self):
+        """Записывает измененные сессии одной транзакцией."""
+        dirty = [(key, session) for key, session in self._sessions.items() if session.dirty]
+        if not dirty:
+            return
+
+        upserts, deletes = [], []
+        for key, session in dirty:
+            session.dirty = False
+            if session.empty:
+                deletes.append(key)
+            else:
+                upserts.append((key, session.state, encode_data(session.data)))
+        try:
+            await asyncio.to_thread(self._write_sync, upserts, deletes)
+            self.flushes += 1
+        except sqlite3.Error as e:
+            # Не потеряем изменения: попробуем записать при следующем сбросе
+            for _, session in dirty:
+                session.dirty = True
+            print(f"[ERROR] FSM storage flush failed: {e}")
+        self._evict()
+
+    # ===== Память =====
+
+    def _evict(self):
+        """Оставляет в памяти не больше max_entries сессий (несохраненные ждут сброса)."""
+        now = time.monotonic()
+        excess = len(self._sessions) - self.max_entries
+        # Последняя сессия - та, с которой сейчас работают
+        current = next(reversed(self._sessions), None)
+        evicted = []
+        for key, session in self._sessions.items():
+            if key == current or (excess <= 0 and now - session.used_at <= self.ttl):
+                break
+            if not session.dirty:
+                evicted.append(key)
+                excess -= 1
+        for key in evicted:
+            del self._sessions[key]
+
+    async def _session(self, key: StorageKey) -> _Session:
+        name = self._key(key)
+        session = self._sessions.get(name)
+        if session is None:
+            try:
+                row = await asyncio.to_thread(self._load_sync, name)
+            except sqlite3.Error as e:
+                print(f"[ERROR] FSM storage read failed: {e}")
+                row = None
+            self.loads += 1
+            # Пока читали, сессию мог создать параллельный апдейт - он главнее
+            session = self._sessions.get(name)
+            if session is None:
+                session = _Session(row[0], decode_data(row[1])) if row else _Session()
+                self._sessions[name] = session
+                if len(self._sessions) > self.max_entries:
+                    self._evict()
+        session.used_at = time.monotonic()
+        self._sessions.move_to_end(name)
+        return session
+
+    # ===== BaseStorage =====
+
+    async def set_state(self, key: StorageKey, state: StateType = None) -> None:
+        session = await self._session(key)
+        session.state = state.state if isinstance(state, State) else state
+        session.dirty = True
+
+    async def get_state(self, key: StorageKey) -> Optional[str]:
+        return (await self._session(key)).state
+
+    async def set_data(self, key: StorageKey, data: Dict[str, Any]) -> None:
+        session = await self._session(key)
+        session.data = data.copy()
+        session.dirty = True
+
+    async def get_data(self, key: StorageKey) -> Dict[str, Any]:
+        return (await self._session(key)).data.copy()
+
+    # ===== Жизненный цикл =====
+
+    async def _flush_loop(self):
+        """Периодически сбрасывает изменения и чистит устаревшие сессии."""
+        next_cleanup = time.monotonic() + self.cleanup_interval
+        while True:
+            await asyncio.sleep(self.flush_interval)
+            await self.flush()
+            if time.monotonic() >= next_cleanup:
+                next_cleanup = time.monotonic() + self.cleanup_interval
+                try:
+                    await asyncio.to_thread(self.cleanup)
+                except sqlite3.Error as e:
+                    print(f"[ERROR] FSM storage cleanup failed: {e}")
+
+    async def start(self):
+        """Запускает фоновую запись изменений."""
+        if self._flush_task is None:
+            self._flush_task = asyncio.create_task(self._flush_loop())
+
+    async def close(self) -> None:
+        """Останавливает фоновую запись, сохраняет изменения и закрывает базу."""
+        if self._flush_task is not None:
+            self._flush_task.cancel()
+            try:
+                await self._flush_task
+            except asyncio.CancelledError:
+                pass
+            self._flush_task = None
+
+        await self.flush()
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
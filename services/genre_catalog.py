@@ -0,0 +1,79 @@
+import asyncio
+import time
+from typing import Awaitable, Callable, Dict, Iterable, Optional
+from config import (
+    GENRES_TTL,
+    GENRES_RETRY_INTERVAL
+)
+
+
+# loader(language, refresh) - при refresh=True общие кэши ответов должны обходиться
+GenreLoader = Callable[[str, bool], Awaitable[Dict[str, int]]]
+
+
+class GenreCatalog:
+    """Общий для процесса каталог жанров TMDB по языкам.
+
+    Пустой ответ (ошибка TMDB) не кэшируется и не затирает уже загруженные жанры.
+    """
+
+    def __init__(self, ttl: float = GENRES_TTL, retry_interval: float = GENRES_RETRY_INTERVAL):
+        self.ttl = ttl
+        self.retry_interval = retry_interval
+        self._genres: Dict[str, Dict[str, int]] = {}
+        self._loaded_at: Dict[str, float] = {}
+        self._failed_at: Dict[str, float] = {}
+        self._loading: Dict[str, asyncio.Task] = {}
+        self._warm_up_task: Optional[asyncio.Task] = None
+
+    async def get(self, language: str, loader: GenreLoader) -> Dict[str, int]:
+        """Возвращает жанры; устаревший каталог отдается сразу и обновляется в фоне."""
+        genres = self._genres.get(language)
+        if genres:
+            if time.monotonic() - self._loaded_at[language] >= self.ttl:
+                self._start_load(language, loader, refresh=True)
+            return genres
+
+        # После неудачи не долбим TMDB на каждый запрос пользователя
+        failed_at = self._failed_at.get(language)
+        if failed_at is not None and time.monotonic() - failed_at < self.retry_interval:
+            return {}
+
+        return await asyncio.shield(self._start_load(language, loader, refresh=False))
+
+    def _start_load(self, language: str, loader: GenreLoader, refresh: bool) -> asyncio.Task:
+        """Запускает загрузку, если она еще не идет."""
+        task = self._loading.get(language)
+        if task is None:
+            task = asyncio.create_task(self._load(language, loader, refresh))
+            self._loading[language] = task
+            task.add_done_callback(lambda _: self._loading.pop(language, None))
+        return task
+
+    async def _load(self, language: str, loader: GenreLoader, refresh: bool) -> Dict[str, int]:
+        """Загружает жанры; при ошибке оставляет прежний список."""
+        try:
+            genres = await loader(language, refresh)
+        except Exception as e:
+            print(f"[ERROR] Genres loading failed: {e}")
+            genres = {}
+
+        if not genres:
+            self._failed_at[language] = time.monotonic()
+            return self._genres.get(language, {})
+
+        self._genres[language] = genres
+        self._loaded_at[language] = time.monotonic()
+        self._failed_at.pop(language, None)
+        return genres
+
+    def warm_up(self, languages: Iterable[str], loader: GenreLoader) -> asyncio.Task:
+        """Загружает жанры в фоне при старте бота."""
+        async def run():
+            await asyncio.gather(*(self.get(language, loader) for language in languages))
+
+        self._warm_up_task = asyncio.create_task(run())
+        return self._warm_up_task
+
+
+genre_catalog = GenreCatalog()
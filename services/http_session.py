@@ -0,0 +1,50 @@
+import asyncio
+import aiohttp
+from typing import Optional
+from config import (
+    HTTP_CONNECTION_LIMIT,
+    HTTP_CONNECTION_LIMIT_PER_HOST,
+    HTTP_KEEPALIVE_TIMEOUT,
+    HTTP_DNS_CACHE_TTL
+)
+
+
+_session: Optional[aiohttp.ClientSession] = None
+_session_lock = asyncio.Lock()
+
+
+def _create_session() -> aiohttp.ClientSession:
+    """Создает сессию с пулом соединений, keep-alive и кэшем DNS."""
+    connector = aiohttp.TCPConnector(
+        limit=HTTP_CONNECTION_LIMIT,
+        limit_per_host=HTTP_CONNECTION_LIMIT_PER_HOST,
+        keepalive_timeout=HTTP_KEEPALIVE_TIMEOUT,
+        ttl_dns_cache=HTTP_DNS_CACHE_TTL,
+        use_dns_cache=True
+    )
+    return aiohttp.ClientSession(connector=connector)
+
+
+async def init_session() -> aiohttp.ClientSession:
+    """Создает общую HTTP-сессию (вызывается при старте бота)."""
+    global _session
+    async with _session_lock:
+        if _session is None or _session.closed:
+            _session = _create_session()
+    return _session
+
+
+async def get_session() -> aiohttp.ClientSession:
+    """Возвращает общую HTTP-сессию, создавая ее при необходимости."""
+    if _session is None or _session.closed:
+        return await init_session()
+    return _session
+
+
+async def close_session():
+    """Закрывает общую HTTP-сессию (вызывается при остановке бота)."""
+    global _session
+    async with _session_lock:
+        if _session is not None and not _session.closed:
+            await _session.close()
+        _session = None
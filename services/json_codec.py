@@ -0,0 +1,24 @@
+import json
+from typing import Any, Union
+
+try:
+    import orjson
+except ImportError:  # orjson необязателен - без него работает стандартный json
+    orjson = None
+
+
+JSON_BACKEND = "orjson" if orjson is not None else "json"
+
+
+def loads(data: Union[bytes, str]) -> Any:
+    """Разбирает JSON прямо из байтов ответа."""
+    if orjson is not None:
+        return orjson.loads(data)
+    return json.loads(data)
+
+
+def dumps(value: Any) -> bytes:
+    """Кодирует значение в компактный JSON (UTF-8)."""
+    if orjson is not None:
+        return orjson.dumps(value)
+    return json.dumps(value, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
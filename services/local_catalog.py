@@ -0,0 +1,262 @@
+import asyncio
+import os
+import sqlite3
+import threading
+import time
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+from config import (
+    LOCAL_CATALOG_PATH,
+    LOCAL_CATALOG_LANGUAGE,
+    LOCAL_CATALOG_MAX_AGE
+)
+
+
+# Сортировки TMDB discover -> ORDER BY (id в конце делает порядок стабильным)
+SORT_ORDERS = {
+    "popularity.desc": "popularity DESC",
+    "vote_average.desc": "vote_average DESC",
+    "primary_release_date.desc": "release_date DESC",
+    "original_title.asc": "original_title ASC",
+}
+
+MOVIE_COLUMNS = (
+    "id", "title", "original_title", "release_date", "vote_average",
+    "vote_count", "popularity", "poster_path", "adult"
+)
+
+
+class LocalCatalog:
+    """Локальный каталог фильмов (SQLite) для discover-запросов без обращения к TMDB.
+
+    Каталог собирается отдельно (tools.build_catalog) из ежедневных выгрузок
+    идентификаторов TMDB и закэшированных ответов. Запрос отвечается локально,
+    только если каталог свежий, полный (собран по всей выгрузке) и фильтры
+    ему по силам; иначе - None, и поиск идет в TMDB как обычно. Частичный
+    каталог (из кэша или топ-N выгрузки) дал бы урезанную выдачу и неверное
+    число результатов, поэтому для ответов не используется.
+    """
+
+    def __init__(
+        self,
+        path: Optional[str] = LOCAL_CATALOG_PATH,
+        language: str = LOCAL_CATALOG_LANGUAGE,
+        max_age: float = LOCAL_CATALOG_MAX_AGE
+    ):
+        self.path = path
+        self.language = language
+        self.max_age = max_age
+        self._conn: Optional[sqlite3.Connection] = None
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    @property
+    def enabled(self) -> bool:
+        return bool(self.path)
+
+    def _connect(self, create: bool = False) -> Optional[sqlite3.Connection]:
+        """Открывает базу; без create отсутствующий каталог не создается."""
+        if self._conn is None:
+            if not create and not os.path.exists(self.path):
+                return None
+            conn = sqlite3.connect(self.path, timeout=5, isolation_level=None, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.executescript(
+                "CREATE TABLE IF NOT EXISTS movies ("
+                " id INTEGER PRIMARY KEY, title TEXT NOT NULL, original_title TEXT NOT NULL,"
+                " release_date TEXT NOT NULL, year INTEGER, vote_average REAL NOT NULL,"
+                " vote_count INTEGER NOT NULL, popularity REAL NOT NULL, poster_path TEXT,"
+                " adult INTEGER NOT NULL, updated_at REAL NOT NULL);"
+                "CREATE TABLE IF NOT EXISTS movie_genres ("
+                " genre_id INTEGER NOT NULL, movie_id INTEGER NOT NULL,"
+                " PRIMARY KEY (genre_id, movie_id)) WITHOUT ROWID;"
+                "CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT NOT NULL);"
+                "CREATE INDEX IF NOT EXISTS movies_year ON movies (year, popularity);"
+                "CREATE INDEX IF NOT EXISTS movies_rating ON movies (vote_average);"
+                "CREATE INDEX IF NOT EXISTS movies_popularity ON movies (popularity);"
+                "CREATE INDEX IF NOT EXISTS movie_genres_movie ON movie_genres (movie_id);"
+            )
+            self._conn = conn
+        return self._conn
+
+    # ===== Наполнение (tools.build_catalog) =====
+
+    def upsert_movies(self, movies: Iterable[Dict[str, Any]]) -> int:
+        """Добавляет или обновляет фильмы в формате TMDB (результаты поиска или детали)."""
+        now = time.time()
+        count = 0
+        with self._lock:
+            conn = self._connect(create=True)
+            conn.execute("BEGIN")
+            try:
+                for movie in movies:
+                    if not movie.get("id") or not movie.get("title"):
+                        continue
+                    genre_ids = movie.get("genre_ids")
+                    if genre_ids is None:
+                        genre_ids = [g["id"] for g in movie.get("genres") or ()]
+                    release_date = movie.get("release_date") or ""
+                    conn.execute(
+                        "INSERT OR REPLACE INTO movies VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                        (
+                            movie["id"], movie["title"], movie.get("original_title") or movie["title"],
+                            release_date, int(release_date[:4]) if release_date[:4].isdigit() else None,
+                            movie.get("vote_average") or 0.0, movie.get("vote_count") or 0,
+                            movie.get("popularity") or 0.0, movie.get("poster_path"),
+                            int(bool(movie.get("adult"))), now
+                        )
+                    )
+                    conn.execute("DELETE FROM movie_genres WHERE movie_id = ?", (movie["id"],))
+                    conn.executemany(
+                        "INSERT INTO movie_genres VALUES (?, ?)",
+                        [(genre_id, movie["id"]) for genre_id in set(genre_ids)]
+                    )
+                    count += 1
+                conn.execute("COMMIT")
+            except Exception:
+                conn.execute("ROLLBACK")
+                raise
+        return count
+
+    def known_ids(self, max_age: Optional[float] = None) -> set:
+        """Идентификаторы фильмов в каталоге (не старше max_age, если задан)."""
+        with self._lock:
+            conn = self._connect(create=True)
+            if max_age is None:
+                rows = conn.execute("SELECT id FROM movies")
+            else:
+                rows = conn.execute("SELECT id FROM movies WHERE updated_at > ?", (time.time() - max_age,))
+            return {row[0] for row in rows}
+
+    def mark_built(self, source: str, complete: bool, export_date: Optional[str] = None):
+        """Отмечает сборку: время (свежесть), полноту и дату выгрузки, по которой собран каталог."""
+        with self._lock:
+            conn = self._connect(create=True)
+            conn.executemany(
+                "INSERT OR REPLACE INTO meta VALUES (?, ?)",
+                [
+                    ("built_at", str(time.time())), ("language", self.language), ("source", source),
+                    ("complete", "1" if complete else "0"), ("export_date", export_date or "")
+                ]
+            )
+
+    # ===== Запросы =====
+
+    def _covers(self, conn: sqlite3.Connection) -> bool:
+        """Каталог свежий и собран по всей выгрузке TMDB."""
+        meta = dict(conn.execute("SELECT key, value FROM meta WHERE key IN ('built_at', 'complete')"))
+        return (
+            meta.get("complete") == "1"
+            and "built_at" in meta
+            and time.time() - float(meta["built_at"]) < self.max_age
+        )
+
+    def _query_sync(
+        self,
+        genre_ids: List[int],
+        year: Optional[int],
+        min_rating: Optional[float],
+        include_adult: bool,
+        sort_by: str,
+        offset: int,
+        limit: int
+    ) -> Optional[Tuple[List[Dict[str, Any]], int]]:
+        with self._lock:
+            conn = self._connect()
+            if conn is None or not self._covers(conn):
+                return None
+
+            where, args = [], []
+            if genre_ids:
+                # with_genres через запятую в TMDB означает "все жанры сразу"
+                placeholders = ",".join("?" * len(genre_ids))
+                where.append(
+                    f"id IN (SELECT movie_id FROM movie_genres WHERE genre_id IN ({placeholders})"
+                    " GROUP BY movie_id HAVING COUNT(*) = ?)"
+                )
+                args.extend(genre_ids)
+                args.append(len(genre_ids))
+            if year:
+                where.append("year = ?")
+                args.append(year)
+            if min_rating is not None:
+                where.append("vote_average >= ?")
+                args.append(min_rating)
+            if not include_adult:
+                where.append("adult = 0")
+            condition = " WHERE " + " AND ".join(where) if where else ""
+
+            total = conn.execute(f"SELECT COUNT(*) FROM movies{condition}", args).fetchone()[0]
+            if not total:
+                return None
+
+            rows = conn.execute(
+                f"SELECT {', '.join(MOVIE_COLUMNS)} FROM movies{condition}"
+                f" ORDER BY {SORT_ORDERS[sort_by]}, id LIMIT ? OFFSET ?",
+                args + [limit, offset]
+            ).fetchall()
+            movies = [dict(zip(MOVIE_COLUMNS, row)) for row in rows]
+            if movies:
+                ids = [m["id"] for m in movies]
+                genres: Dict[int, List[int]] = {}
+                for genre_id, movie_id in conn.execute(
+                    f"SELECT genre_id, movie_id FROM movie_genres"
+                    f" WHERE movie_id IN ({','.join('?' * len(ids))})", ids
+                ):
+                    genres.setdefault(movie_id, []).append(genre_id)
+                for movie in movies:
+                    movie["genre_ids"] = genres.get(movie["id"], [])
+            return movies, total
+
+    def can_answer(self, language: str, region: Optional[str], sort_by: str, include_adult: bool) -> bool:
+        """Может ли каталог в принципе ответить на такой запрос (фильмов для взрослых в нем нет)."""
+        return (
+            self.enabled
+            and language == self.language
+            and region is None
+            and not include_adult
+            and sort_by in SORT_ORDERS
+        )
+
+    async def discover_page(
+        self,
+        page: int,
+        per_page: int,
+        genre_ids: Optional[List[int]] = None,
+        year: Optional[int] = None,
+        min_rating: Optional[float] = None,
+        include_adult: bool = False,
+        sort_by: str = "popularity.desc"
+    ) -> Optional[Dict[str, Any]]:
+        """Страница в формате ответа /discover/movie или None, если ответа локально нет."""
+        try:
+            result = await asyncio.to_thread(
+                self._query_sync, list(genre_ids or []), year, min_rating,
+                include_adult, sort_by, (page - 1) * per_page, per_page
+            )
+        except sqlite3.Error as e:
+            print(f"[ERROR] Local catalog query failed: {e}")
+            result = None
+
+        if result is None:
+            self.misses += 1
+            return None
+
+        self.hits += 1
+        movies, total = result
+        return {
+            "page": page,
+            "results": movies,
+            "total_pages": (total + per_page - 1) // per_page,
+            "total_results": total
+        }
+
+    def close(self):
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+
+
+local_catalog = LocalCatalog()
@@ -1,5 +1,7 @@
 from typing import Dict, List, Any, Optional
+from models.movie import Movie
 from services.tmdb_api import TMDBApi
+from services.result_source import LazySearchResults
 
 
 class MovieService:
@@ -16,40 +18,40 @@ class MovieService:
         """Возвращает список популярных жанров."""
         return self._popular_genres
     
-    async def search_movies_with_filters(self, filters: Dict[str, Any]) -> List[Dict[str, Any]]:
-        """Поиск фильмов с применением фильтров."""
+    async def search_movies_with_filters(self, filters: Dict[str, Any]) -> List[Movie]:
+        """Поиск фильмов с применением фильтров (все страницы сразу).
+
+        Тот же поиск, что у open_search, чтобы порядок и обработка не расходились.
+        """
         try:
-            movies = await self.tmdb_api.search_movies(
-                title=filters.get("title"),
-                genre_ids=filters.get("genre_ids"),
-                year=filters.get("year"),
-                min_rating=filters.get("min_rating"),
-                language=filters.get("language"),
-                region=filters.get("region"),
-                include_adult=filters.get("include_adult", False),
-                sort_by=filters.get("sort_by", "popularity.desc")
-            )
-            
-            # Дополнительная фильтрация если нужно
-            return self._post_process_movies(movies, filters)
+            return await self.open_search(filters).ensure_all()
             
         except Exception as e:
             print(f"[ERROR] Movie search failed: {e}")
             return []
     
-    def _post_process_movies(self, movies: List[Dict[str, Any]], filters: Dict[str, Any]) -> List[Dict[str, Any]]:
+    def open_search(self, filters: Dict[str, Any]) -> LazySearchResults:
+        """Ленивый поиск с фильтрами: обработка применяется к каждой загруженной порции."""
+        return self.tmdb_api.open_search(
+            title=filters.get("title"),
+            genre_ids=filters.get("genre_ids"),
+            year=filters.get("year"),
+            min_rating=filters.get("min_rating"),
+            language=filters.get("language"),
+            region=filters.get("region"),
+            include_adult=filters.get("include_adult", False),
+            sort_by=filters.get("sort_by", "popularity.desc"),
+            post_process=lambda movies: self._post_process_movies(movies, filters)
+        )
+    
+    def _post_process_movies(self, movies: List[Movie], filters: Dict[str, Any]) -> List[Movie]:
         """Дополнительная обработка результатов."""
         if not movies:
             return []
         
-        # Удаляем фильмы без постеров для лучшего UX
-        movies = [m for m in movies if m.get("poster_path")]
-        
-        # Сортируем по популярности если не задано другое
-        if not filters.get("sort_by") or filters.get("sort_by") == "popularity.desc":
-            movies.sort(key=lambda x: x.get("popularity", 0), reverse=True)
-        
-        return movies
+        # Удаляем фильмы без постеров для лучшего UX;
+        # порядок sort_by уже обеспечивает слияние источников
+        return [m for m in movies if m.poster_path]
     
     async def get_movie_recommendations(self, movie_id: int, limit: int = 10) -> List[Dict[str, Any]]:
         """Получает рекомендации для фильма."""
@@ -0,0 +1,57 @@
+from collections import OrderedDict
+from math import ceil
+from typing import Hashable, Optional
+from config import (
+    TMDB_RESULTS_PER_PAGE,
+    TMDB_READ_AHEAD_PAGES,
+    SEARCH_MAX_PAGES_PER_STEP,
+    SEARCH_MIN_SELECTIVITY,
+    SEARCH_SELECTIVITY_ALPHA
+)
+
+
+class PageBudget:
+    """Подбирает число страниц TMDB на шаг загрузки по избирательности фильтров.
+
+    Избирательность (доля фильмов, прошедших локальный фильтр) запоминается
+    для каждой сигнатуры фильтров, поэтому даже первый шаг нового поиска
+    запрашивает столько страниц, сколько обычно нужно для таких фильтров.
+    """
+
+    def __init__(
+        self,
+        alpha: float = SEARCH_SELECTIVITY_ALPHA,
+        max_signatures: int = 1000
+    ):
+        self.alpha = alpha
+        self.max_signatures = max_signatures
+        self._selectivity: "OrderedDict[Hashable, float]" = OrderedDict()
+
+    def estimate(self, signature: Optional[Hashable]) -> Optional[float]:
+        """Запомненная избирательность для сигнатуры фильтров."""
+        if signature is None:
+            return None
+        return self._selectivity.get(signature)
+
+    def record(self, signature: Optional[Hashable], raw: int, kept: int):
+        """Учитывает результат загрузки (экспоненциальное сглаживание)."""
+        if signature is None or raw <= 0:
+            return
+
+        observed = kept / raw
+        previous = self._selectivity.pop(signature, None)
+        if previous is not None:
+            observed = previous + self.alpha * (observed - previous)
+        self._selectivity[signature] = observed
+
+        while len(self._selectivity) > self.max_signatures:
+            self._selectivity.popitem(last=False)
+
+    def pages_for(self, wanted: int, selectivity: float) -> int:
+        """Сколько страниц запросить, чтобы получить wanted отфильтрованных фильмов."""
+        selectivity = max(selectivity, SEARCH_MIN_SELECTIVITY)
+        pages = ceil(wanted / (TMDB_RESULTS_PER_PAGE * selectivity)) + TMDB_READ_AHEAD_PAGES
+        return max(1, min(pages, SEARCH_MAX_PAGES_PER_STEP))
+
+
+page_budget = PageBudget()
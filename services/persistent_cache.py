@@ -0,0 +1,150 @@
+import asyncio
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+from typing import Any, Hashable, Optional, Tuple
+from services import json_codec
+from config import (
+    TMDB_DISK_CACHE_PATH,
+    TMDB_DISK_CACHE_COMPACT_INTERVAL
+)
+
+
+class PersistentCache:
+    """Дисковый уровень кэша ответов TMDB (SQLite в режиме WAL).
+
+    Файл можно безопасно использовать из нескольких процессов бота на одном хосте,
+    поэтому кэш переживает перезапуски и не прогревается каждой репликой заново.
+    """
+
+    def __init__(
+        self,
+        path: Optional[str] = TMDB_DISK_CACHE_PATH,
+        compact_interval: float = TMDB_DISK_CACHE_COMPACT_INTERVAL
+    ):
+        self.path = path
+        self.compact_interval = compact_interval
+        self._conn: Optional[sqlite3.Connection] = None
+        self._lock = threading.Lock()
+        self._compaction_task: Optional[asyncio.Task] = None
+        self.hits = 0
+        self.misses = 0
+
+    @property
+    def enabled(self) -> bool:
+        return bool(self.path)
+
+    @staticmethod
+    def _hash_key(key: Hashable) -> str:
+        """Превращает ключ запроса в строку фиксированной длины."""
+        return hashlib.sha1(json.dumps(key, ensure_ascii=False).encode("utf-8")).hexdigest()
+
+    def _connect(self) -> sqlite3.Connection:
+        """Открывает базу при первом обращении."""
+        if self._conn is None:
+            conn = sqlite3.connect(
+                self.path, timeout=5, isolation_level=None, check_same_thread=False
+            )
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS responses ("
+                "key TEXT PRIMARY KEY, expires_at REAL NOT NULL, value BLOB NOT NULL)"
+            )
+            conn.execute(
+                "CREATE INDEX IF NOT EXISTS responses_expires_at ON responses (expires_at)"
+            )
+            self._conn = conn
+        return self._conn
+
+    def _get_sync(self, key: str) -> Optional[Tuple[bytes, float]]:
+        with self._lock:
+            row = self._connect().execute(
+                "SELECT value, expires_at FROM responses WHERE key = ? AND expires_at > ?",
+                (key, time.time())
+            ).fetchone()
+        return row
+
+    def _set_sync(self, key: str, value: bytes, expires_at: float):
+        with self._lock:
+            self._connect().execute(
+                "INSERT OR REPLACE INTO responses (key, expires_at, value) VALUES (?, ?, ?)",
+                (key, expires_at, value)
+            )
+
+    def compact(self) -> int:
+        """Удаляет просроченные записи и сжимает журнал WAL."""
+        with self._lock:
+            conn = self._connect()
+            deleted = conn.execute(
+                "DELETE FROM responses WHERE expires_at <= ?", (time.time(),)
+            ).rowcount
+            conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+        return deleted
+
+    async def get(self, key: Hashable) -> Optional[Tuple[Any, float]]:
+        """Возвращает (ответ, оставшийся TTL) или None."""
+        if not self.enabled:
+            return None
+
+        try:
+            row = await asyncio.to_thread(self._get_sync, self._hash_key(key))
+        except sqlite3.Error as e:
+            print(f"[ERROR] Disk cache read failed: {e}")
+            return None
+
+        if row is None:
+            self.misses += 1
+            return None
+
+        self.hits += 1
+        value, expires_at = row
+        return json_codec.loads(value), expires_at - time.time()
+
+    async def set(self, key: Hashable, value: Any, ttl: float, encoded: Optional[bytes] = None):
+        """Сохраняет ответ на ttl секунд."""
+        if not self.enabled or ttl <= 0:
+            return
+
+        if encoded is None:
+            encoded = json_codec.dumps(value)
+        try:
+            await asyncio.to_thread(
+                self._set_sync, self._hash_key(key), encoded, time.time() + ttl
+            )
+        except sqlite3.Error as e:
+            print(f"[ERROR] Disk cache write failed: {e}")
+
+    async def _compaction_loop(self):
+        """Периодически чистит просроченные записи."""
+        while True:
+            await asyncio.sleep(self.compact_interval)
+            try:
+                await asyncio.to_thread(self.compact)
+            except sqlite3.Error as e:
+                print(f"[ERROR] Disk cache compaction failed: {e}")
+
+    def start(self):
+        """Запускает фоновое сжатие кэша."""
+        if self.enabled and self._compaction_task is None:
+            self._compaction_task = asyncio.create_task(self._compaction_loop())
+
+    async def close(self):
+        """Останавливает фоновое сжатие и закрывает базу."""
+        if self._compaction_task is not None:
+            self._compaction_task.cancel()
+            try:
+                await self._compaction_task
+            except asyncio.CancelledError:
+                pass
+            self._compaction_task = None
+
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+
+
+tmdb_disk_cache = PersistentCache()
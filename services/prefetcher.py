@@ -0,0 +1,56 @@
+import asyncio
+from typing import Awaitable, Callable, Iterable, Optional
+from config import (
+    PREFETCH_MAX_CONCURRENT,
+    PREFETCH_RESERVE_TOKENS,
+    PREFETCH_MAX_WAIT
+)
+from services.rate_limiter import tmdb_rate_limiter
+from services.user_tasks import user_tasks
+
+
+DetailsFetcher = Callable[[int], Awaitable[Optional[dict]]]
+
+
+class DetailsPrefetcher:
+    """Фоновый прогрев кэша деталей для фильмов на странице результатов.
+
+    Запросы идут с низким приоритетом: только пока у общего ограничителя
+    есть запас, чтобы не отнимать квоту у интерактивных запросов.
+    У каждого пользователя активна не больше одной задачи прогрева.
+    """
+
+    def __init__(
+        self,
+        max_concurrent: int = PREFETCH_MAX_CONCURRENT,
+        reserve_tokens: float = PREFETCH_RESERVE_TOKENS,
+        max_wait: float = PREFETCH_MAX_WAIT
+    ):
+        self.reserve_tokens = reserve_tokens
+        self.max_wait = max_wait
+        self._semaphore = asyncio.Semaphore(max_concurrent)
+        self.fetched = 0
+        self.skipped = 0
+
+    def schedule(self, user_id: int, movie_ids: Iterable[int], fetch: DetailsFetcher):
+        """Запускает прогрев, отменяя предыдущий прогрев пользователя."""
+        user_tasks.start(user_id, user_tasks.PREFETCH, self._run(list(movie_ids), fetch))
+
+    def cancel(self, user_id: int):
+        """Отменяет прогрев пользователя (например, при выходе в меню)."""
+        user_tasks.cancel(user_id, user_tasks.PREFETCH)
+
+    async def _run(self, movie_ids, fetch: DetailsFetcher):
+        for movie_id in movie_ids:
+            async with self._semaphore:
+                if not await tmdb_rate_limiter.wait_for_spare_capacity(self.reserve_tokens, self.max_wait):
+                    self.skipped += 1
+                    continue
+                try:
+                    await fetch(movie_id)
+                    self.fetched += 1
+                except Exception as e:
+                    print(f"[ERROR] Details prefetch failed: {e}")
+
+
+details_prefetcher = DetailsPrefetcher()
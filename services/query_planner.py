@@ -0,0 +1,138 @@
+import logging
+from collections import Counter
+from typing import Any, Dict, Hashable, List, Optional
+from config import (
+    MAX_PAGES_TO_SHOW,
+    PLANNER_MIN_SEARCH_SELECTIVITY,
+    PLANNER_UNION_DISCOVER_PAGES
+)
+from services.page_budget import page_budget
+
+
+logger = logging.getLogger(__name__)
+
+
+class QueryPlan:
+    """Выбранная стратегия поиска и ее оценочная стоимость в запросах к TMDB."""
+
+    SEARCH_ONLY = "search_only"
+    DISCOVER_ONLY = "discover_only"
+    BOUNDED_UNION = "bounded_union"
+
+    def __init__(
+        self,
+        kind: str,
+        estimated_requests: int,
+        max_requests: int,
+        discover_pages: int = MAX_PAGES_TO_SHOW,
+        reason: str = ""
+    ):
+        self.kind = kind
+        self.estimated_requests = estimated_requests
+        self.max_requests = max_requests
+        self.discover_pages = discover_pages
+        self.reason = reason
+
+    @property
+    def uses_search(self) -> bool:
+        return self.kind != self.DISCOVER_ONLY
+
+    @property
+    def uses_discover(self) -> bool:
+        return self.kind != self.SEARCH_ONLY
+
+    def __repr__(self) -> str:
+        return (f"QueryPlan({self.kind}, est={self.estimated_requests}, "
+                f"max={self.max_requests}, reason={self.reason!r})")
+
+
+class QueryPlanner:
+    """Выбирает самую дешевую стратегию поиска по набору фильтров.
+
+    /search/movie сам учитывает название, год и регион, а жанры и рейтинг
+    проверяются локально. /discover/movie название игнорирует, поэтому
+    с названием он нужен только как добавка, когда фильтры отсеивают почти
+    всю выдачу поиска или их избирательность еще не известна, - и тогда
+    число его страниц ограничено.
+    """
+
+    def __init__(
+        self,
+        min_search_selectivity: float = PLANNER_MIN_SEARCH_SELECTIVITY,
+        union_discover_pages: int = PLANNER_UNION_DISCOVER_PAGES
+    ):
+        self.min_search_selectivity = min_search_selectivity
+        self.union_discover_pages = union_discover_pages
+        self.plans = Counter()
+        self.estimated_requests = Counter()
+
+    def plan(
+        self,
+        title: Optional[str],
+        genre_ids: Optional[List[int]],
+        min_rating: Optional[float],
+        search_signature: Optional[Hashable],
+        wanted: int
+    ) -> QueryPlan:
+        """Строит план для первого экрана из wanted фильмов."""
+        has_local_filters = bool(genre_ids) or min_rating is not None
+
+        if not title:
+            plan = QueryPlan(
+                QueryPlan.DISCOVER_ONLY,
+                estimated_requests=page_budget.pages_for(wanted, 1.0),
+                max_requests=MAX_PAGES_TO_SHOW,
+                reason="no title"
+            )
+        elif not has_local_filters:
+            plan = QueryPlan(
+                QueryPlan.SEARCH_ONLY,
+                estimated_requests=page_budget.pages_for(wanted, 1.0),
+                max_requests=MAX_PAGES_TO_SHOW,
+                reason="title without local filters"
+            )
+        else:
+            learned = page_budget.estimate(search_signature)
+
+            if learned is not None and learned >= self.min_search_selectivity:
+                plan = QueryPlan(
+                    QueryPlan.SEARCH_ONLY,
+                    estimated_requests=page_budget.pages_for(wanted, learned),
+                    max_requests=MAX_PAGES_TO_SHOW,
+                    reason=f"search selectivity {learned:.2f}"
+                )
+            else:
+                # Пока избирательность фильтров не изучена, страхуемся discover
+                selectivity = learned if learned is not None else 1.0
+                plan = QueryPlan(
+                    QueryPlan.BOUNDED_UNION,
+                    estimated_requests=(
+                        page_budget.pages_for(wanted, selectivity) + page_budget.pages_for(wanted, 1.0)
+                    ),
+                    max_requests=MAX_PAGES_TO_SHOW + self.union_discover_pages,
+                    discover_pages=self.union_discover_pages,
+                    reason=(
+                        f"low search selectivity {learned:.2f}" if learned is not None
+                        else "unknown search selectivity"
+                    )
+                )
+
+        self.plans[plan.kind] += 1
+        self.estimated_requests[plan.kind] += plan.estimated_requests
+        logger.info(
+            "Query plan %s: ~%d requests (max %d), %s",
+            plan.kind, plan.estimated_requests, plan.max_requests, plan.reason
+        )
+        return plan
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            kind: {
+                "plans": count,
+                "avg_estimated_requests": self.estimated_requests[kind] / count
+            }
+            for kind, count in self.plans.items()
+        }
+
+
+query_planner = QueryPlanner()
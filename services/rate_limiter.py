@@ -0,0 +1,123 @@
+import asyncio
+import time
+from contextlib import asynccontextmanager
+from email.utils import parsedate_to_datetime
+from typing import Mapping, Optional
+from config import (
+    MAX_CONCURRENT_REQUESTS,
+    TMDB_RATE_LIMIT_RPS,
+    TMDB_RATE_LIMIT_BURST
+)
+
+
+def parse_retry_after(value: Optional[str]) -> Optional[float]:
+    """Разбирает заголовок Retry-After (секунды или HTTP-дата)."""
+    if not value:
+        return None
+
+    value = value.strip()
+    try:
+        return max(float(value), 0.0)
+    except ValueError:
+        pass
+
+    try:
+        retry_at = parsedate_to_datetime(value)
+        return max(retry_at.timestamp() - time.time(), 0.0)
+    except (TypeError, ValueError):
+        return None
+
+
+class RateLimiter:
+    """Общий для процесса ограничитель запросов (token bucket + лимит параллельности)."""
+
+    def __init__(
+        self,
+        rate: float = TMDB_RATE_LIMIT_RPS,
+        burst: int = TMDB_RATE_LIMIT_BURST,
+        max_concurrent: int = MAX_CONCURRENT_REQUESTS
+    ):
+        self.rate = rate
+        self.burst = burst
+        self.max_concurrent = max_concurrent
+        self._tokens = float(burst)
+        self._updated = time.monotonic()
+        self._blocked_until = 0.0
+        self._lock = asyncio.Lock()
+        self._semaphore = asyncio.Semaphore(max_concurrent)
+
+    def _refill(self, now: float):
+        """Пополняет корзину токенов за прошедшее время."""
+        self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    async def acquire(self):
+        """Ждет свободный токен; ожидающие обслуживаются по очереди."""
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                if now < self._blocked_until:
+                    await asyncio.sleep(self._blocked_until - now)
+                    continue
+
+                self._refill(now)
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+
+                await asyncio.sleep((1 - self._tokens) / self.rate)
+
+    @asynccontextmanager
+    async def slot(self):
+        """Занимает место среди параллельных запросов и токен на отправку."""
+        async with self._semaphore:
+            await self.acquire()
+            yield
+
+    def has_spare_capacity(self, reserve: float) -> bool:
+        """Есть ли запас токенов и свободные слоты (для фоновых запросов)."""
+        now = time.monotonic()
+        if now < self._blocked_until or self._semaphore.locked():
+            return False
+        self._refill(now)
+        return self._tokens >= reserve
+
+    async def wait_for_spare_capacity(self, reserve: float, max_wait: float) -> bool:
+        """Ждет запаса для фонового запроса; False - не дождались за max_wait секунд."""
+        deadline = time.monotonic() + max_wait
+        while not self.has_spare_capacity(reserve):
+            if time.monotonic() >= deadline:
+                return False
+            await asyncio.sleep(0.2)
+        return True
+
+    def is_queued(self) -> bool:
+        """Ждет ли кто-то слот или токен прямо сейчас."""
+        return self._semaphore.locked() or self._lock.locked()
+
+    def pause(self, seconds: float):
+        """Приостанавливает все запросы на заданное время."""
+        self._blocked_until = max(self._blocked_until, time.monotonic() + seconds)
+        self._tokens = 0.0
+
+    def update_from_headers(self, headers: Mapping[str, str]):
+        """Учитывает заголовки Retry-After и X-RateLimit-* из ответа."""
+        retry_after = parse_retry_after(headers.get("Retry-After"))
+        if retry_after is not None:
+            self.pause(retry_after)
+            return
+
+        remaining = headers.get("X-RateLimit-Remaining")
+        reset = headers.get("X-RateLimit-Reset")
+        if remaining is None or reset is None:
+            return
+
+        try:
+            if int(remaining) <= 0:
+                # Reset передается как unix-время окончания окна
+                self.pause(max(float(reset) - time.time(), 0.0))
+        except ValueError:
+            pass
+
+
+tmdb_rate_limiter = RateLimiter()
@@ -0,0 +1,140 @@
+import re
+import time
+from collections import deque
+from typing import Any, Dict, Optional
+from urllib.parse import urlsplit
+from config import (
+    BREAKER_FAILURE_THRESHOLD,
+    BREAKER_RESET_TIMEOUT,
+    TMDB_HEDGE_ENABLED,
+    TMDB_HEDGE_PERCENTILE,
+    TMDB_HEDGE_MIN_SAMPLES,
+    TMDB_HEDGE_MIN_DELAY
+)
+
+
+_NUMERIC_SEGMENT = re.compile(r"/\d+(?=/|$)")
+
+
+def endpoint_of(url: str) -> str:
+    """Имя эндпоинта без идентификаторов: /3/movie/550 -> /3/movie/{id}."""
+    return _NUMERIC_SEGMENT.sub("/{id}", urlsplit(url).path)
+
+
+class CircuitBreaker:
+    """Размыкатель цепи: после серии ошибок запросы сразу отклоняются.
+
+    Через reset_timeout пропускается один пробный запрос; его успех замыкает
+    цепь, ошибка - снова размыкает.
+    """
+
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    def __init__(
+        self,
+        failure_threshold: int = BREAKER_FAILURE_THRESHOLD,
+        reset_timeout: float = BREAKER_RESET_TIMEOUT
+    ):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.state = self.CLOSED
+        self.failures = 0
+        self.opened_at = 0.0
+        self.rejected = 0
+        self._probe_in_flight = False
+
+    def allow(self) -> bool:
+        """Можно ли отправить запрос."""
+        if self.state == self.CLOSED:
+            return True
+
+        if self.state == self.OPEN and time.monotonic() - self.opened_at >= self.reset_timeout:
+            self.state = self.HALF_OPEN
+            self._probe_in_flight = False
+
+        if self.state == self.HALF_OPEN and not self._probe_in_flight:
+            self._probe_in_flight = True
+            return True
+
+        self.rejected += 1
+        return False
+
+    def record_success(self):
+        self.state = self.CLOSED
+        self.failures = 0
+        self._probe_in_flight = False
+
+    def record_failure(self):
+        self.failures += 1
+        if self.state == self.HALF_OPEN or self.failures >= self.failure_threshold:
+            if self.state != self.OPEN:
+                print(f"[ERROR] Circuit opened after {self.failures} failures")
+            self.state = self.OPEN
+            self.opened_at = time.monotonic()
+            self._probe_in_flight = False
+
+
+class LatencyTracker:
+    """Скользящее окно задержек успешных запросов."""
+
+    def __init__(self, window: int = 200):
+        self._samples = deque(maxlen=window)
+
+    def add(self, seconds: float):
+        self._samples.append(seconds)
+
+    def percentile(self, q: float) -> Optional[float]:
+        """Квантиль задержки или None, если данных пока мало."""
+        if len(self._samples) < TMDB_HEDGE_MIN_SAMPLES:
+            return None
+        ordered = sorted(self._samples)
+        return ordered[min(int(q * len(ordered)), len(ordered) - 1)]
+
+
+class EndpointGuard:
+    """Размыкатель цепи и статистика задержек одного эндпоинта."""
+
+    def __init__(self):
+        self.breaker = CircuitBreaker()
+        self.latency = LatencyTracker()
+        self.hedged = 0
+        self.hedge_wins = 0
+
+    def hedge_delay(self) -> Optional[float]:
+        """Через сколько секунд отправлять резервный запрос (None - не отправлять)."""
+        if not TMDB_HEDGE_ENABLED:
+            return None
+        p = self.latency.percentile(TMDB_HEDGE_PERCENTILE)
+        return max(p, TMDB_HEDGE_MIN_DELAY) if p is not None else None
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "state": self.breaker.state,
+            "failures": self.breaker.failures,
+            "rejected": self.breaker.rejected,
+            "p95": self.latency.percentile(0.95),
+            "hedged": self.hedged,
+            "hedge_wins": self.hedge_wins
+        }
+
+
+class EndpointGuards:
+    """Реестр EndpointGuard по эндпоинтам."""
+
+    def __init__(self):
+        self._guards: Dict[str, EndpointGuard] = {}
+
+    def for_url(self, url: str) -> EndpointGuard:
+        endpoint = endpoint_of(url)
+        guard = self._guards.get(endpoint)
+        if guard is None:
+            guard = self._guards[endpoint] = EndpointGuard()
+        return guard
+
+    def stats(self) -> Dict[str, Dict[str, Any]]:
+        return {endpoint: guard.stats() for endpoint, guard in self._guards.items()}
+
+
+tmdb_guards = EndpointGuards()
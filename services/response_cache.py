@@ -0,0 +1,112 @@
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Hashable, Optional, Tuple
+from urllib.parse import urlsplit
+from services import json_codec
+from config import (
+    TMDB_CACHE_MAX_BYTES,
+    TMDB_CACHE_DEFAULT_TTL,
+    TMDB_CACHE_TTL
+)
+
+
+class ResponseCache:
+    """LRU-кэш ответов TMDB с TTL по эндпоинтам и ограничением памяти в байтах."""
+
+    def __init__(
+        self,
+        max_bytes: int = TMDB_CACHE_MAX_BYTES,
+        ttl_rules: Optional[Dict[str, float]] = None,
+        default_ttl: float = TMDB_CACHE_DEFAULT_TTL
+    ):
+        self.max_bytes = max_bytes
+        self.ttl_rules = ttl_rules if ttl_rules is not None else TMDB_CACHE_TTL
+        self.default_ttl = default_ttl
+        self._entries: "OrderedDict[Hashable, Tuple[float, int, Any]]" = OrderedDict()
+        self.size_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    def ttl_for(self, url: str) -> float:
+        """Возвращает TTL для эндпоинта (первое совпавшее правило)."""
+        path = urlsplit(url).path
+        for fragment, ttl in self.ttl_rules.items():
+            if fragment in path:
+                return ttl
+        return self.default_ttl
+
+    @staticmethod
+    def _estimate_size(value: Any) -> int:
+        """Оценивает размер ответа по длине его JSON-представления."""
+        return len(json_codec.dumps(value))
+
+    def get(self, key: Hashable, allow_stale: bool = False) -> Optional[Any]:
+        """Возвращает ответ из кэша или None.
+
+        Просроченные записи не удаляются сразу (их вытесняет LRU), чтобы
+        с allow_stale=True их можно было отдать, пока TMDB недоступен.
+        """
+        entry = self._entries.get(key)
+        if entry is None:
+            self.misses += 1
+            return None
+
+        expires_at, size, value = entry
+        if time.monotonic() >= expires_at and not allow_stale:
+            self.expirations += 1
+            self.misses += 1
+            return None
+
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return value
+
+    def set(self, key: Hashable, value: Any, ttl: float, size: Optional[int] = None):
+        """Сохраняет ответ, вытесняя давно не использованные записи."""
+        if ttl <= 0:
+            return
+
+        if size is None:
+            size = self._estimate_size(value)
+        if size > self.max_bytes:
+            return
+
+        if key in self._entries:
+            self._remove(key)
+
+        self._entries[key] = (time.monotonic() + ttl, size, value)
+        self.size_bytes += size
+
+        while self.size_bytes > self.max_bytes:
+            oldest = next(iter(self._entries))
+            self._remove(oldest)
+            self.evictions += 1
+
+    def _remove(self, key: Hashable):
+        """Удаляет запись и уменьшает занятый объем."""
+        _, size, _ = self._entries.pop(key)
+        self.size_bytes -= size
+
+    def clear(self):
+        """Очищает кэш (счетчики сохраняются)."""
+        self._entries.clear()
+        self.size_bytes = 0
+
+    def stats(self) -> Dict[str, Any]:
+        """Счетчики кэша для логов и метрик."""
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "size_bytes": self.size_bytes,
+            "max_bytes": self.max_bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "expirations": self.expirations,
+            "hit_rate": self.hits / lookups if lookups else 0.0
+        }
+
+
+tmdb_response_cache = ResponseCache()
@@ -0,0 +1,91 @@
+import heapq
+from collections import deque
+from typing import Any, Callable, Deque, List, Optional, Tuple
+from models.movie import Movie
+
+
+SortKey = Callable[[Movie], Any]
+
+
+def _release_date_desc(movie: Movie) -> int:
+    # Фильмы без даты - в конце, как у TMDB
+    date = movie.release_date.replace("-", "")
+    return -int(date) if date.isdigit() else 0
+
+
+# Ключи по возрастанию для сортировок TMDB
+SORT_KEYS = {
+    "popularity.desc": lambda movie: -movie.popularity,
+    "vote_average.desc": lambda movie: -movie.vote_average,
+    "primary_release_date.desc": _release_date_desc,
+    "original_title.asc": lambda movie: movie.original_title.lower(),
+}
+
+
+def sort_key_for(sort_by: Optional[str]) -> Optional[SortKey]:
+    return SORT_KEYS.get(sort_by or "popularity.desc")
+
+
+class KWayMerge:
+    """Потоковое слияние нескольких упорядоченных источников (куча по головам).
+
+    Фильм выдается, только когда известны головы всех незавершенных
+    источников: тогда ни один из них уже не сможет прислать что-то раньше.
+    Порции источников, упорядоченных не по sort_by (поиск по названию
+    сортируется по релевантности), перед слиянием сортируются.
+    Без известной сортировки фильмы выдаются в порядке поступления.
+    """
+
+    def __init__(self, sources: int, sort_by: Optional[str] = None):
+        self.key = sort_key_for(sort_by)
+        self._buffers: List[Deque[Movie]] = [deque() for _ in range(sources)]
+        self._finished = [False] * sources
+        self._heap: List[Tuple[Any, int, int]] = []
+        self._seq = 0
+
+    def _push_head(self, index: int):
+        buffer = self._buffers[index]
+        if buffer:
+            self._seq += 1
+            key = self.key(buffer[0]) if self.key else 0
+            heapq.heappush(self._heap, (key, self._seq, index))
+
+    def push(self, index: int, movies: List[Movie], presorted: bool = True):
+        """Добавляет очередную порцию источника; presorted - уже упорядочена по sort_by."""
+        if not movies:
+            return
+        if not presorted and self.key:
+            movies = sorted(movies, key=self.key)
+        buffer = self._buffers[index]
+        was_empty = not buffer
+        buffer.extend(movies)
+        if was_empty:
+            self._push_head(index)
+
+    def finish(self, index: int):
+        """Источник больше ничего не пришлет."""
+        self._finished[index] = True
+
+    def waiting(self) -> List[int]:
+        """Источники, без следующей порции которых слияние не может продолжиться."""
+        return [
+            index for index, buffer in enumerate(self._buffers)
+            if not buffer and not self._finished[index]
+        ]
+
+    @property
+    def buffered(self) -> int:
+        return sum(len(buffer) for buffer in self._buffers)
+
+    @property
+    def drained(self) -> bool:
+        return all(self._finished) and not self._heap
+
+    def pop_ready(self, limit: int) -> List[Movie]:
+        """Выдает до limit фильмов, порядок которых уже окончательно известен."""
+        ready = []
+        while len(ready) < limit and self._heap and not self.waiting():
+            _, _, index = heapq.heappop(self._heap)
+            ready.append(self._buffers[index].popleft())
+            self._push_head(index)
+        return ready
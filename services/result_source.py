@@ -0,0 +1,470 @@
+import asyncio
+import hashlib
+import json
+import time
+from collections import OrderedDict
+from math import ceil
+from typing import Dict, Any, List, Optional, Callable, Awaitable, Hashable
+from config import (
+    TMDB_RESULTS_PER_PAGE,
+    MAX_PAGES_TO_SHOW,
+    RESULTS_TTL,
+    RESULTS_SHARE_MAX_AGE,
+    MAX_STORED_RESULTS
+)
+from models.movie import Movie, project_movies
+from services.page_budget import page_budget
+from services.title_index import TitleIndex
+from services.query_planner import QueryPlan
+from services.result_merge import KWayMerge
+
+
+PageFetcher = Callable[[int], Awaitable[Dict[str, Any]]]
+BatchFilter = Callable[[List[Movie]], List[Movie]]
+
+
+class PagedSource:
+    """Ленивый постраничный источник результатов одного эндпоинта TMDB."""
+
+    def __init__(
+        self,
+        fetch_page: PageFetcher,
+        max_pages: int = MAX_PAGES_TO_SHOW,
+        batch_filter: Optional[BatchFilter] = None,
+        signature: Optional[Hashable] = None,
+        ordered: bool = True
+    ):
+        self.fetch_page = fetch_page
+        self.max_pages = max_pages
+        self.batch_filter = batch_filter
+        self.signature = signature
+        # Отдает ли эндпоинт фильмы уже в порядке сортировки результатов
+        self.ordered = ordered
+        self.next_page = 1
+        self.total_pages: Optional[int] = None
+        self.total_results: Optional[int] = None
+        self.raw_count = 0
+        self.kept_count = 0
+        self._pending: "OrderedDict[int, asyncio.Task]" = OrderedDict()
+
+    @property
+    def exhausted(self) -> bool:
+        """Все доступные страницы уже загружены."""
+        return (
+            self.total_pages is not None
+            and self.next_page > self.total_pages
+            and not self._pending
+        )
+
+    @property
+    def has_pending(self) -> bool:
+        return bool(self._pending)
+
+    @property
+    def selectivity(self) -> float:
+        """Доля фильмов, проходящих локальный фильтр (наблюдаемая или запомненная)."""
+        if not self.batch_filter:
+            return 1.0
+        if self.raw_count:
+            return self.kept_count / self.raw_count
+
+        learned = page_budget.estimate(self.signature)
+        return learned if learned is not None else 1.0
+
+    def pages_for(self, wanted: int) -> int:
+        """Сколько страниц запросить за шаг, чтобы набрать wanted фильмов."""
+        return page_budget.pages_for(wanted, self.selectivity)
+
+    def estimate_remaining(self) -> int:
+        """Оценивает количество еще не загруженных фильмов (с учетом фильтра)."""
+        if self.exhausted:
+            return 0
+        if self.total_pages is None:
+            return TMDB_RESULTS_PER_PAGE
+
+        remaining_pages = self.total_pages - self.next_page + 1
+        remaining = min(
+            remaining_pages * TMDB_RESULTS_PER_PAGE,
+            max((self.total_results or 0) - self.raw_count, 0)
+        )
+        # Учитываем долю фильмов, прошедших локальный фильтр
+        if self.raw_count:
+            remaining = remaining * self.kept_count / self.raw_count
+        return int(remaining)
+
+    def schedule(self, pages: int):
+        """Запускает загрузку следующих pages страниц, не дожидаясь их."""
+        if pages < 1 or (self.total_pages is not None and self.next_page > self.total_pages):
+            return
+
+        first = self.next_page
+        if self.total_pages is None:
+            # Общее число страниц еще неизвестно - запрашиваем страницы
+            # параллельно, не дожидаясь первой
+            last = first + min(pages, self.max_pages) - 1
+        else:
+            last = min(first + pages - 1, self.total_pages)
+        self.next_page = last + 1
+
+        for page in range(first, last + 1):
+            self._pending[page] = asyncio.ensure_future(self.fetch_page(page))
+
+    def head(self) -> Optional[asyncio.Task]:
+        """Загрузка ближайшей по номеру страницы (None - ничего не загружается)."""
+        return next(iter(self._pending.values()), None)
+
+    def take_ready(self) -> List[Movie]:
+        """Забирает готовые страницы по порядку номеров, пока не встретится незагруженная."""
+        movies = []
+        raw = 0
+        while self._pending:
+            page, task = next(iter(self._pending.items()))
+            if not task.done():
+                break
+            del self._pending[page]
+
+            try:
+                page_data = task.result()
+            except Exception as e:
+                print(f"[ERROR] Page {page} loading failed: {e}")
+                page_data = {}
+
+            if self.total_pages is None:
+                if not page_data:
+                    self.total_pages = 0
+                else:
+                    self.total_pages = min(page_data.get("total_pages", 1), self.max_pages)
+                    self.total_results = page_data.get("total_results", 0)
+                # Спекулятивно запрошенные страницы за пределами выдачи не нужны
+                for extra in [p for p in self._pending if p > self.total_pages]:
+                    self._pending.pop(extra).cancel()
+                self.next_page = min(self.next_page, self.total_pages + 1)
+
+            # Сразу оставляем только нужные поля фильма
+            results = project_movies(page_data.get("results", [])) if page_data else []
+            raw += len(results)
+            if self.batch_filter:
+                results = self.batch_filter(results)
+            movies.extend(results)
+
+        self.raw_count += raw
+        self.kept_count += len(movies)
+        if self.batch_filter and raw:
+            page_budget.record(self.signature, raw, len(movies))
+
+        return movies
+
+    def cancel_pending(self):
+        """Отменяет незавершенные загрузки; эти страницы можно будет запросить заново."""
+        if not self._pending:
+            return
+        self.next_page = next(iter(self._pending))
+        for task in self._pending.values():
+            task.cancel()
+        self._pending.clear()
+
+
+class LazySearchResults:
+    """Результаты поиска, которые подгружаются по мере пролистывания."""
+
+    def __init__(
+        self,
+        sources: List[PagedSource],
+        post_process: Optional[BatchFilter] = None,
+        plan: Optional[QueryPlan] = None,
+        sort_by: Optional[str] = None
+    ):
+        self.sources = sources
+        self.post_process = post_process
+        self.plan = plan
+        self.movies: List[Movie] = []
+        self._merge = KWayMerge(len(sources), sort_by)
+        self._seen_ids = set()
+        self._title_index: Optional[TitleIndex] = None
+        self._lock = asyncio.Lock()
+
+    @property
+    def exhausted(self) -> bool:
+        """Все источники полностью загружены, количество результатов точное."""
+        return self._merge.drained
+
+    @property
+    def total_count(self) -> int:
+        """Количество результатов (оценка, пока загружено не все)."""
+        return (
+            len(self.movies)
+            + self._merge.buffered
+            + sum(s.estimate_remaining() for s in self.sources)
+        )
+
+    def total_pages(self, per_page: int) -> int:
+        """Количество страниц бота для отображения."""
+        return max(1, ceil(self.total_count / per_page))
+
+    def _append(self, movies: List[Movie]):
+        """Добавляет новые фильмы, убирая дубликаты."""
+        fresh = []
+        for movie in movies:
+            if movie.id not in self._seen_ids:
+                self._seen_ids.add(movie.id)
+                fresh.append(movie)
+
+        if self.post_process:
+            fresh = self.post_process(fresh)
+        self.movies.extend(fresh)
+
+    def title_index(self) -> TitleIndex:
+        """Индекс названий загруженных фильмов; строится при первом выборе фильма."""
+        if self._title_index is None:
+            self._title_index = TitleIndex()
+        indexed = len(self._title_index)
+        if indexed < len(self.movies):
+            self._title_index.add(self.movies[indexed:])
+        return self._title_index
+
+    async def _load_step(self, waiting: List[int], wanted: int, all_pages: bool = False):
+        """Догружает источники, которые держат слияние, до первой готовой страницы."""
+        heads = []
+        for index in waiting:
+            source = self.sources[index]
+            if not source.has_pending:
+                if all_pages:
+                    # Первую страницу берем отдельно, чтобы узнать их общее число
+                    pages = source.max_pages if source.total_pages is not None else 1
+                else:
+                    # Размер шага зависит от избирательности фильтров источника
+                    pages = source.pages_for(wanted)
+                source.schedule(pages)
+            head = source.head()
+            if head is not None:
+                heads.append(head)
+
+        # Продолжаем, как только готова любая ближайшая страница, а не все сразу
+        if heads:
+            await asyncio.wait(heads, return_when=asyncio.FIRST_COMPLETED)
+
+        for index in waiting:
+            source = self.sources[index]
+            self._merge.push(index, source.take_ready(), presorted=source.ordered)
+            if source.exhausted:
+                self._merge.finish(index)
+
+    async def _fill(self, count: Optional[int]):
+        """Выдает фильмы из слияния, пока их не станет count (None - все)."""
+        while count is None or len(self.movies) < count:
+            limit = self._merge.buffered if count is None else count - len(self.movies)
+            self._append(self._merge.pop_ready(limit))
+            if count is not None and len(self.movies) >= count:
+                break
+
+            waiting = self._merge.waiting()
+            if not waiting:
+                if self._merge.drained:
+                    break
+                continue
+            if count is None:
+                await self._load_step(waiting, 0, all_pages=True)
+            else:
+                await self._load_step(waiting, count - len(self.movies))
+
+    async def ensure(self, count: int) -> List[Movie]:
+        """Подгружает страницы TMDB, пока не наберется count фильмов."""
+        async with self._lock:
+            await self._fill(count)
+        return self.movies
+
+    async def ensure_all(self) -> List[Movie]:
+        """Загружает все доступные страницы всех источников."""
+        async with self._lock:
+            await self._fill(None)
+        return self.movies
+
+    def cancel(self):
+        """Отменяет загрузку страниц, которые уже никому не нужны."""
+        for source in self.sources:
+            source.cancel_pending()
+
+
+def query_key(**params: Any) -> str:
+    """Ключ набора результатов по нормализованным параметрам поиска.
+
+    Одинаковые запросы разных пользователей получают один ключ: регистр
+    и лишние пробелы в названии, порядок жанров и незаданные фильтры
+    на ключ не влияют.
+    """
+    normalized = {}
+    for name, value in params.items():
+        if value is None or value == [] or value == "":
+            continue
+        if name == "title":
+            value = " ".join(value.lower().split())
+        elif name == "genre_ids":
+            value = sorted(set(value))
+        normalized[name] = value
+
+    raw = json.dumps(normalized, sort_keys=True, ensure_ascii=False)
+    return hashlib.sha1(raw.encode("utf-8")).hexdigest()[:20]
+
+
+class _StoredResults:
+    __slots__ = ("key", "results", "created_at", "used_at", "holders")
+
+    def __init__(self, key: str, results: LazySearchResults, now: float):
+        self.key = key
+        self.results = results
+        self.created_at = now
+        self.used_at = now
+        self.holders = set()
+
+
+class ResultRegistry:
+    """Общее хранилище наборов результатов, адресуемых по ключу запроса.
+
+    Одинаковые поиски разных пользователей разделяют один набор (и его
+    загруженные страницы), в состоянии FSM хранится только ключ. Набор
+    держат пользователи, которые с ним сейчас работают (счетчик ссылок);
+    при переполнении сначала вытесняются наборы без держателей, а любые
+    наборы, к которым долго не обращались, удаляются по TTL.
+
+    Когда слишком старый набор заменяется свежим, прежние держатели
+    остаются со своим: свежий достается только новым поискам.
+    """
+
+    def __init__(
+        self,
+        ttl: float = RESULTS_TTL,
+        max_entries: int = MAX_STORED_RESULTS,
+        share_max_age: float = RESULTS_SHARE_MAX_AGE
+    ):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.share_max_age = share_max_age
+        self._entries: "OrderedDict[str, _StoredResults]" = OrderedDict()
+        # Замененные наборы, которые еще держат пользователи
+        self._retired: List[_StoredResults] = []
+        self._held: Dict[int, _StoredResults] = {}
+        self.shared = 0
+        self.created = 0
+
+    def acquire(self, user_id: int, key: str, factory: Callable[[], LazySearchResults]) -> LazySearchResults:
+        """Возвращает набор по ключу, создавая его при необходимости, и закрепляет за пользователем.
+
+        Прежний набор пользователя при этом освобождается. Слишком старый
+        или пустой загруженный набор (поиск ничего не нашел или TMDB ответил
+        ошибкой) новым поиском не переиспользуется: его место занимает свежий.
+        """
+        self.release(user_id)
+        now = time.monotonic()
+
+        entry = self._entries.get(key)
+        if entry is not None and (
+            now - entry.used_at > self.ttl
+            or now - entry.created_at > self.share_max_age
+            or (entry.results.exhausted and not entry.results.movies)
+        ):
+            del self._entries[key]
+            if entry.holders:
+                self._retired.append(entry)
+            entry = None
+
+        if entry is None:
+            entry = _StoredResults(key, factory(), now)
+            self._entries[key] = entry
+            self.created += 1
+        else:
+            entry.used_at = now
+            self.shared += 1
+
+        entry.holders.add(user_id)
+        self._held[user_id] = entry
+        self._entries.move_to_end(key)
+        self._evict()
+        return entry.results
+
+    def release(self, user_id: int):
+        """Пользователь больше не работает со своим набором (новый поиск или выход в меню).
+
+        Если набор больше никто не держит, его недогруженные страницы
+        отменяются: загруженное остается для следующих таких же поисков.
+        """
+        entry = self._held.pop(user_id, None)
+        if entry is not None:
+            entry.holders.discard(user_id)
+            if not entry.holders:
+                entry.results.cancel()
+
+    def abandon(self, user_id: int):
+        """Освобождает набор, поиск по которому прерван; недогруженный ничей набор удаляется."""
+        entry = self._held.get(user_id)
+        self.release(user_id)
+        if entry is not None and not entry.holders and not entry.results.movies:
+            self._forget(entry)
+
+    def drop(self, user_id: int):
+        """Удаляет набор пользователя из хранилища целиком (пустой или неудачный поиск).
+
+        Такой набор нельзя отдавать другим: ошибка TMDB иначе выглядела бы
+        для всех как "ничего не найдено".
+        """
+        entry = self._held.get(user_id)
+        if entry is not None:
+            self._forget(entry)
+
+    def _forget(self, entry: _StoredResults):
+        """Убирает набор из хранилища и у всех его держателей."""
+        if self._entries.get(entry.key) is entry:
+            del self._entries[entry.key]
+        for holder in entry.holders:
+            if self._held.get(holder) is entry:
+                del self._held[holder]
+        entry.holders.clear()
+        entry.results.cancel()
+
+    def _evict(self):
+        """Вытесняет наборы сверх лимита: сначала давно не нужные никому."""
+        now = time.monotonic()
+        retired, self._retired = self._retired, []
+        for entry in retired:
+            if entry.holders and now - entry.used_at <= self.ttl:
+                self._retired.append(entry)
+            else:
+                self._forget(entry)
+
+        excess = len(self._entries) - self.max_entries
+        if excess <= 0:
+            return
+        unheld = [entry for entry in self._entries.values() if not entry.holders]
+        for entry in unheld[:excess]:
+            del self._entries[entry.key]
+            excess -= 1
+        while excess > 0:
+            self._forget(next(iter(self._entries.values())))
+            excess -= 1
+
+    def get(self, key: Optional[str], user_id: Optional[int] = None) -> Optional[LazySearchResults]:
+        """Возвращает результаты по ключу, если они еще не устарели.
+
+        С user_id сначала ищется набор, который держит этот пользователь:
+        он мог быть уже заменен свежим для новых поисков.
+        """
+        if not key:
+            return None
+        entry = self._held.get(user_id) if user_id is not None else None
+        if entry is None or entry.key != key:
+            entry = self._entries.get(key)
+        if entry is None:
+            return None
+
+        now = time.monotonic()
+        if now - entry.used_at > self.ttl:
+            self._forget(entry)
+            return None
+
+        # Продлеваем жизнь результатов, с которыми работает пользователь
+        entry.used_at = now
+        if self._entries.get(key) is entry:
+            self._entries.move_to_end(key)
+        return entry.results
+
+
+search_results = ResultRegistry()
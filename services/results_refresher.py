@@ -0,0 +1,97 @@
+import asyncio
+import time
+from typing import Any, Awaitable, Callable, Optional, Tuple
+from config import (
+    PROGRESSIVE_MAX_MOVIES,
+    PROGRESSIVE_EDIT_INTERVAL,
+    PROGRESSIVE_RESERVE_TOKENS,
+    PROGRESSIVE_MAX_WAIT,
+    TMDB_RESULTS_PER_PAGE
+)
+from services.rate_limiter import tmdb_rate_limiter
+from services.result_source import LazySearchResults
+from services.user_tasks import user_tasks
+
+
+# render() -> (текст, клавиатура) или None, если пользователь ушел со страницы результатов
+PageRenderer = Callable[[], Awaitable[Optional[Tuple[str, Any]]]]
+MessageEditor = Callable[[str, Any], Awaitable[Any]]
+
+
+class ResultsRefresher:
+    """Догружает результаты в фоне после показа первой страницы.
+
+    Счетчик найденных фильмов и число страниц в сообщении обновляются
+    на месте, не чаще раза в edit_interval секунд. Загрузка идет с низким
+    приоритетом, как прогрев деталей; у пользователя одна такая задача.
+    """
+
+    def __init__(
+        self,
+        max_movies: int = PROGRESSIVE_MAX_MOVIES,
+        edit_interval: float = PROGRESSIVE_EDIT_INTERVAL,
+        reserve_tokens: float = PROGRESSIVE_RESERVE_TOKENS,
+        max_wait: float = PROGRESSIVE_MAX_WAIT
+    ):
+        self.max_movies = max_movies
+        self.edit_interval = edit_interval
+        self.reserve_tokens = reserve_tokens
+        self.max_wait = max_wait
+        self.edits = 0
+
+    def schedule(
+        self,
+        user_id: int,
+        results: LazySearchResults,
+        shown_text: str,
+        render: PageRenderer,
+        edit: MessageEditor
+    ):
+        """Запускает фоновую догрузку, отменяя предыдущую у пользователя."""
+        self.cancel(user_id)
+        if results.exhausted:
+            return
+        user_tasks.start(user_id, user_tasks.REFRESH, self._run(results, shown_text, render, edit))
+
+    def cancel(self, user_id: int):
+        user_tasks.cancel(user_id, user_tasks.REFRESH)
+
+    async def _refresh(self, shown_text: str, render: PageRenderer, edit: MessageEditor) -> Optional[str]:
+        """Перерисовывает страницу, если что-то изменилось; None - пользователь ушел."""
+        rendered = await render()
+        if rendered is None:
+            return None
+        text, keyboard = rendered
+        if text != shown_text:
+            await edit(text, keyboard)
+            self.edits += 1
+        return text
+
+    async def _run(self, results: LazySearchResults, shown_text: str, render: PageRenderer, edit: MessageEditor):
+        try:
+            last_edit = time.monotonic()
+            dirty = False
+            while not results.exhausted and len(results.movies) < self.max_movies:
+                if not await tmdb_rate_limiter.wait_for_spare_capacity(self.reserve_tokens, self.max_wait):
+                    break
+                await results.ensure(len(results.movies) + TMDB_RESULTS_PER_PAGE)
+                dirty = True
+
+                if time.monotonic() - last_edit >= self.edit_interval:
+                    shown_text = await self._refresh(shown_text, render, edit)
+                    if shown_text is None:
+                        return
+                    last_edit = time.monotonic()
+                    dirty = False
+
+            if dirty:
+                # Финальное обновление - тоже не раньше интервала после предыдущего
+                await asyncio.sleep(max(0.0, last_edit + self.edit_interval - time.monotonic()))
+                await self._refresh(shown_text, render, edit)
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            print(f"[ERROR] Progressive results refresh failed: {e}")
+
+
+results_refresher = ResultsRefresher()
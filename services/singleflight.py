@@ -0,0 +1,95 @@
+import asyncio
+from contextvars import ContextVar
+from typing import Any, Awaitable, Callable, Dict, Hashable, Optional
+
+
+class _Call:
+    """Общее выполнение и число тех, кто его ждет."""
+
+    __slots__ = ("task", "waiters", "sent")
+
+    def __init__(self):
+        self.task: Optional[asyncio.Task] = None
+        self.waiters = 0
+        self.sent = False
+
+
+# Выполнение, внутри которого сейчас работает код (см. mark_sent)
+_current_call: ContextVar[Optional[_Call]] = ContextVar("singleflight_call", default=None)
+
+
+def mark_sent():
+    """Отмечает, что текущее общее выполнение уже отправило запрос в сеть.
+
+    Такой запрос доводится до конца, даже если его больше никто не ждет:
+    квота на него уже потрачена, а ответ пригодится кэшу.
+    """
+    call = _current_call.get()
+    if call is not None:
+        call.sent = True
+
+
+class SingleFlight:
+    """Объединяет одинаковые одновременные запросы в одно выполнение.
+
+    Когда уходит последний ожидающий, а запрос еще не отправлен (например,
+    стоит в очереди ограничителя скорости), выполнение отменяется.
+    """
+
+    def __init__(self):
+        self._calls: Dict[Hashable, _Call] = {}
+        self.started = 0
+        self.coalesced = 0
+        self.cancelled = 0
+
+    @property
+    def in_flight(self) -> int:
+        """Количество выполняющихся сейчас уникальных запросов."""
+        return len(self._calls)
+
+    def running(self, key: Hashable) -> bool:
+        return key in self._calls
+
+    async def do(self, key: Hashable, func: Callable[[], Awaitable[Any]]) -> Any:
+        """Выполняет func один раз для всех одновременных вызовов с тем же ключом."""
+        call = self._calls.get(key)
+        if call is None:
+            self.started += 1
+            call = _Call()
+            # Задача наследует контекст, поэтому внутри нее mark_sent видит call
+            token = _current_call.set(call)
+            try:
+                call.task = asyncio.ensure_future(func())
+            finally:
+                _current_call.reset(token)
+            self._calls[key] = call
+            call.task.add_done_callback(lambda _: self._forget(key, call))
+        else:
+            self.coalesced += 1
+
+        call.waiters += 1
+        try:
+            # Отмена одного ожидающего не должна прерывать общий запрос
+            return await asyncio.shield(call.task)
+        finally:
+            call.waiters -= 1
+            if not call.waiters and not call.sent and not call.task.done():
+                # Запрос больше никому не нужен и квоту еще не тратил
+                self._forget(key, call)
+                call.task.cancel()
+                self.cancelled += 1
+
+    def _forget(self, key: Hashable, call: _Call):
+        """Убирает выполнение из списка, чтобы новые вызовы начинали свое."""
+        if self._calls.get(key) is call:
+            del self._calls[key]
+
+    async def close(self):
+        """Отменяет все незавершенные выполнения."""
+        tasks = [call.task for call in self._calls.values()]
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+
+tmdb_inflight = SingleFlight()
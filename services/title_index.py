@@ -0,0 +1,96 @@
+import re
+from collections import Counter
+from typing import Dict, List, Optional, Set, Tuple
+from models.movie import Movie
+
+
+_NON_WORD = re.compile(r"[^\w]+")
+
+# Оценки совпадений: точное название и вхождение подстроки всегда выше нечеткого
+EXACT_SCORE = 1.0
+SUBSTRING_SCORE = 0.9
+FUZZY_MAX_SCORE = 0.85
+
+
+def normalize_title(text: str) -> str:
+    """Нижний регистр, ё -> е, без пунктуации и лишних пробелов."""
+    return _NON_WORD.sub(" ", text.lower().replace("ё", "е")).replace("_", " ").strip()
+
+
+def trigrams(normalized: str) -> Set[str]:
+    padded = f"  {normalized} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+class TitleIndex:
+    """Индекс названий фильмов одного набора результатов.
+
+    Триграммы нормализованных названий (русского и оригинального) и словарь
+    по ID. Фильмы добавляются по мере подгрузки страниц, каждый - один раз.
+    """
+
+    def __init__(self):
+        self._movies: List[Movie] = []
+        self._by_id: Dict[int, Movie] = {}
+        # Отдельная запись на каждое название: (позиция фильма, название, число триграмм)
+        self._entries: List[Tuple[int, str, int]] = []
+        self._postings: Dict[str, List[int]] = {}
+
+    def __len__(self) -> int:
+        return len(self._movies)
+
+    def add(self, movies: List[Movie]):
+        for movie in movies:
+            if movie.id in self._by_id:
+                continue
+            position = len(self._movies)
+            self._movies.append(movie)
+            self._by_id[movie.id] = movie
+
+            titles = {normalize_title(movie.title), normalize_title(movie.original_title)}
+            titles.discard("")
+            for title in titles:
+                grams = trigrams(title)
+                entry = len(self._entries)
+                self._entries.append((position, title, len(grams)))
+                for gram in grams:
+                    self._postings.setdefault(gram, []).append(entry)
+
+    def by_id(self, movie_id: int) -> Optional[Movie]:
+        return self._by_id.get(movie_id)
+
+    def search(self, query: str, limit: int = 5, min_score: float = 0.0) -> List[Tuple[float, Movie]]:
+        """Лучшие совпадения по убыванию оценки (при равенстве - в порядке результатов)."""
+        query = normalize_title(query)
+        if not query:
+            return []
+
+        if len(query) < 3:
+            # Слишком короткий запрос для триграмм - только вхождение подстроки
+            candidates = ((entry, 0) for entry in range(len(self._entries)))
+            query_size = 0
+        else:
+            query_grams = trigrams(query)
+            query_size = len(query_grams)
+            shared = Counter()
+            for gram in query_grams:
+                shared.update(self._postings.get(gram, ()))
+            candidates = shared.items()
+
+        best: Dict[int, float] = {}
+        for entry, count in candidates:
+            position, title, size = self._entries[entry]
+            if title == query:
+                score = EXACT_SCORE
+            elif query in title:
+                score = SUBSTRING_SCORE
+            elif count:
+                # Коэффициент Дайса по триграммам
+                score = FUZZY_MAX_SCORE * 2 * count / (query_size + size)
+            else:
+                continue
+            if score > min_score and score > best.get(position, 0.0):
+                best[position] = score
+
+        ranked = sorted(best.items(), key=lambda item: (-item[1], item[0]))
+        return [(score, self._movies[position]) for position, score in ranked[:limit]]
@@ -1,21 +1,38 @@
 import asyncio
-import aiohttp
-from typing import Dict, Any, List, Optional
+import time
+from typing import Dict, Any, List, Optional, Tuple, Mapping
 from config import (
     TMDB_API_KEY, 
     TMDB_BASE_URL, 
-    MAX_CONCURRENT_REQUESTS, 
     MAX_RETRIES, 
-    BASE_RETRY_DELAY
+    BASE_RETRY_DELAY,
+    TMDB_REQUEST_TIMEOUT,
+    TMDB_RESULTS_PER_PAGE,
+    MOVIES_PER_PAGE
 )
+from services import json_codec
+from services.http_session import get_session
+from services.rate_limiter import tmdb_rate_limiter, parse_retry_after
+from services.singleflight import tmdb_inflight, mark_sent
+from services.response_cache import tmdb_response_cache
+from services.persistent_cache import tmdb_disk_cache
+from services.details_cache import movie_details_cache
+from services.genre_catalog import genre_catalog
+from services.resilience import tmdb_guards, EndpointGuard
+from services.local_catalog import local_catalog
+from services.query_planner import query_planner
+from models.movie import Movie
+from services.result_source import PagedSource, LazySearchResults, PageFetcher, BatchFilter
+
+
+# Статус, тело (JSON при 200, текст иначе), заголовки и исходные байты успешного ответа
+AttemptResult = Tuple[int, Any, Mapping[str, str], Optional[bytes]]
 
 
 class TMDBApi:
     def __init__(self):
         self.api_key = TMDB_API_KEY
         self.base_url = TMDB_BASE_URL
-        self.semaphore = asyncio.Semaphore(MAX_CONCURRENT_REQUESTS)
-        self._genres_cache = None
 
     def _clean_params(self, params: Dict[str, Any]) -> Dict[str, Any]:
         """Удаляет пустые параметры и преобразует булевы значения."""
@@ -29,122 +46,266 @@ class TMDBApi:
                 out[k] = v
         return out
 
+    def _request_key(self, url: str, params: Dict[str, Any]) -> Tuple:
+        """Канонический ключ запроса: URL и отсортированные параметры."""
+        return (url, tuple(sorted((k, str(v)) for k, v in params.items())))
+
     async def _fetch_with_retries(
         self, 
-        session: aiohttp.ClientSession, 
         url: str, 
-        params: Dict[str, Any]
+        params: Dict[str, Any],
+        use_cache: bool = True
     ) -> Dict[str, Any]:
-        """Выполняет запрос с повторными попытками при ошибках."""
+        """Выполняет запрос через кэш; одинаковые одновременные запросы выполняются один раз.
+
+        При use_cache=False ответ берется из сети (и обновляет кэш).
+        """
         params = self._clean_params(params)
-        attempt = 0
+        key = self._request_key(url, params)
         
-        while attempt < MAX_RETRIES:
-            attempt += 1
-            async with self.semaphore:
-                try:
-                    async with session.get(url, params=params, timeout=30) as resp:
-                        if resp.status == 200:
-                            return await resp.json()
-                        elif resp.status == 429:
-                            # Rate limit - ждем и повторяем
-                            delay = BASE_RETRY_DELAY * (2 ** (attempt - 1))
-                            await asyncio.sleep(delay)
-                            continue
-                        elif resp.status == 400:
-                            print(f"[ERROR] 400 Bad Request: {await resp.text()}")
-                            return {}
-                        else:
-                            print(f"[ERROR] HTTP {resp.status}: {await resp.text()}")
-                            return {}
-                            
-                except asyncio.TimeoutError:
-                    await asyncio.sleep(1)
-                except Exception as e:
-                    print(f"[ERROR] Request exception: {e}")
-                    await asyncio.sleep(1)
+        if use_cache:
+            cached = tmdb_response_cache.get(key)
+            if cached is not None:
+                return cached
         
-        return {}
+        return await tmdb_inflight.do(
+            (key, use_cache), lambda: self._fetch_and_cache(key, url, params, use_cache)
+        )
 
-    async def get_genres(self) -> Dict[str, int]:
-        """Получает список жанров с кэшированием."""
-        if self._genres_cache:
-            return self._genres_cache
-            
-        async with aiohttp.ClientSession() as session:
-            url = f"{self.base_url}/genre/movie/list"
-            params = {"api_key": self.api_key, "language": "ru-RU"}
-            data = await self._fetch_with_retries(session, url, params)
-            
-            genres = data.get("genres", []) if data else []
-            self._genres_cache = {g["name"].lower(): g["id"] for g in genres}
-            
-        return self._genres_cache
+    async def _fetch_and_cache(
+        self,
+        key: Tuple,
+        url: str,
+        params: Dict[str, Any],
+        use_cache: bool = True
+    ) -> Dict[str, Any]:
+        """Берет ответ с диска или из сети и сохраняет в кэше (ошибки не кэшируются)."""
+        if use_cache:
+            stored = await tmdb_disk_cache.get(key)
+            if stored is not None:
+                data, ttl_left = stored
+                tmdb_response_cache.set(key, data, ttl_left)
+                return data
+        
+        data, raw = await self._request(url, params)
+        if data:
+            # Байты ответа TMDB уже готовый JSON - повторно не сериализуем
+            ttl = tmdb_response_cache.ttl_for(url)
+            tmdb_response_cache.set(key, data, ttl, size=len(raw))
+            await tmdb_disk_cache.set(key, data, ttl, encoded=raw)
+        elif use_cache:
+            # TMDB недоступен - лучше устаревшие данные, чем никаких
+            stale = tmdb_response_cache.get(key, allow_stale=True)
+            if stale is not None:
+                return stale
+        return data
 
-    async def _fetch_all_pages(
+    async def _attempt(
         self,
-        session: aiohttp.ClientSession,
         url: str,
-        base_params: Dict[str, Any],
-        max_pages: int = 50
-    ) -> List[Dict[str, Any]]:
-        """Загружает все страницы результатов."""
-        movies = []
+        params: Dict[str, Any],
+        sent: Optional[asyncio.Event] = None
+    ) -> AttemptResult:
+        """Один HTTP-запрос: статус, тело, заголовки и байты ответа (см. AttemptResult).
+
+        sent выставляется, когда запрос получил слот лимитера и уходит в сеть.
+        """
+        session = await get_session()
+        # Общий лимит скорости и параллельности на весь процесс
+        async with tmdb_rate_limiter.slot():
+            # С этого момента запрос тратит квоту TMDB - отменять его поздно
+            mark_sent()
+            if sent is not None:
+                sent.set()
+            started = time.monotonic()
+            async with session.get(url, params=params, timeout=TMDB_REQUEST_TIMEOUT) as resp:
+                tmdb_rate_limiter.update_from_headers(resp.headers)
+                raw = None
+                if resp.status == 200:
+                    # Разбираем байты ответа быстрым декодером (orjson, если установлен)
+                    raw = await resp.read()
+                    body = json_codec.loads(raw)
+                    tmdb_guards.for_url(url).latency.add(time.monotonic() - started)
+                else:
+                    body = await resp.text()
+                return resp.status, body, resp.headers, raw
+
+    async def _hedged_attempt(
+        self,
+        guard: EndpointGuard,
+        url: str,
+        params: Dict[str, Any]
+    ) -> AttemptResult:
+        """Запрос с резервной копией, если первый отвечает дольше обычного (p95).
+
+        Задержка отсчитывается с момента отправки: время в очереди лимитера
+        к медленному ответу не относится. Пока у лимитера есть очередь,
+        резервный запрос только удлинил бы ее, поэтому он не отправляется.
+        """
+        delay = guard.hedge_delay()
+        if delay is None:
+            return await self._attempt(url, params)
         
-        # Первая страница для определения общего количества
-        params = base_params.copy()
-        params["page"] = 1
-        first_page = await self._fetch_with_retries(session, url, params)
+        sent = asyncio.Event()
+        primary = asyncio.ensure_future(self._attempt(url, params, sent))
+        waiter = asyncio.ensure_future(sent.wait())
+        try:
+            await asyncio.wait({primary, waiter}, return_when=asyncio.FIRST_COMPLETED)
+            if not primary.done():
+                await asyncio.wait({primary}, timeout=delay)
+        except asyncio.CancelledError:
+            primary.cancel()
+            raise
+        finally:
+            waiter.cancel()
+        if primary.done() or tmdb_rate_limiter.is_queued():
+            return await primary
         
-        if not first_page:
-            return []
-            
-        total_pages = min(first_page.get("total_pages", 1), max_pages)
-        results = first_page.get("results", [])
-        movies.extend(results)
+        guard.hedged += 1
+        backup = asyncio.ensure_future(self._attempt(url, params))
+        pending = {primary, backup}
+        try:
+            while True:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is None and task.result()[0] == 200:
+                        if task is backup:
+                            guard.hedge_wins += 1
+                        return task.result()
+                if not pending:
+                    # Оба запроса неудачны - отдаем результат последнего
+                    return done.pop().result()
+        finally:
+            for task in pending:
+                task.cancel()
+
+    async def _request(self, url: str, params: Dict[str, Any]) -> Tuple[Dict[str, Any], Optional[bytes]]:
+        """Выполняет запрос с повторными попытками: ответ и его исходные байты.
+
+        При ошибке или разомкнутой цепи сразу возвращает ({}, None).
+        """
+        guard = tmdb_guards.for_url(url)
+        attempt = 0
         
-        # Остальные страницы асинхронно
-        if total_pages > 1:
-            tasks = []
-            for page in range(2, total_pages + 1):
-                page_params = base_params.copy()
-                page_params["page"] = page
-                tasks.append(self._fetch_with_retries(session, url, page_params))
+        while attempt < MAX_RETRIES:
+            attempt += 1
+            if not guard.breaker.allow():
+                return {}, None
+            
+            try:
+                status, body, headers, raw = await self._hedged_attempt(guard, url, params)
+            except asyncio.TimeoutError:
+                guard.breaker.record_failure()
+            except Exception as e:
+                print(f"[ERROR] Request exception: {e}")
+                guard.breaker.record_failure()
+            else:
+                if status == 200:
+                    guard.breaker.record_success()
+                    return body, raw
+                elif status == 429:
+                    # Rate limit - притормаживаем всех и повторяем
+                    guard.breaker.record_success()
+                    delay = parse_retry_after(headers.get("Retry-After"))
+                    if delay is None:
+                        delay = BASE_RETRY_DELAY * (2 ** (attempt - 1))
+                    tmdb_rate_limiter.pause(delay)
+                    continue
+                elif status == 400:
+                    guard.breaker.record_success()
+                    print(f"[ERROR] 400 Bad Request: {body}")
+                    return {}, None
+                else:
+                    if status >= 500:
+                        guard.breaker.record_failure()
+                    else:
+                        guard.breaker.record_success()
+                    print(f"[ERROR] HTTP {status}: {body}")
+                    return {}, None
             
-            pages = await asyncio.gather(*tasks)
-            for page_data in pages:
-                if page_data and "results" in page_data:
-                    movies.extend(page_data["results"])
+            # Пауза перед повтором - вне слота, чтобы не занимать его
+            await asyncio.sleep(1)
         
-        return movies
+        return {}, None
+
+    async def _load_genres(self, language: str, refresh: bool = False) -> Dict[str, int]:
+        """Загружает список жанров из TMDB."""
+        url = f"{self.base_url}/genre/movie/list"
+        params = {"api_key": self.api_key, "language": language}
+        data = await self._fetch_with_retries(url, params, use_cache=not refresh)
+        
+        genres = data.get("genres", []) if data else []
+        return {g["name"].lower(): g["id"] for g in genres}
+
+    async def get_genres(self, language: str = "ru-RU") -> Dict[str, int]:
+        """Получает список жанров из общего каталога."""
+        return await genre_catalog.get(language, self._load_genres)
+
+    def warm_up_genres(self, languages: List[str]) -> asyncio.Task:
+        """Прогревает каталог жанров в фоне."""
+        return genre_catalog.warm_up(languages, self._load_genres)
+
+    def _page_fetcher(self, url: str, base_params: Dict[str, Any]) -> PageFetcher:
+        """Создает функцию загрузки одной страницы результатов."""
+        async def fetch_page(page: int) -> Dict[str, Any]:
+            params = base_params.copy()
+            params["page"] = page
+            return await self._fetch_with_retries(url, params)
+
+        return fetch_page
+
+    def _discover_fetcher(
+        self,
+        url: str,
+        base_params: Dict[str, Any],
+        filters: Dict[str, Any],
+        language: str,
+        region: Optional[str]
+    ) -> PageFetcher:
+        """Загрузка страниц discover: из локального каталога, а если там нет ответа - из TMDB."""
+        api_fetch = self._page_fetcher(url, base_params)
+        if not local_catalog.can_answer(language, region, filters["sort_by"], filters["include_adult"]):
+            return api_fetch
+
+        use_api = False
+
+        async def fetch_page(page: int) -> Dict[str, Any]:
+            nonlocal use_api
+            if not use_api:
+                data = await local_catalog.discover_page(page, TMDB_RESULTS_PER_PAGE, **filters)
+                if data is not None:
+                    return data
+                # Нумерация страниц каталога и TMDB не совпадает, поэтому
+                # переключаемся целиком, только если каталог не знает ни одного фильма
+                use_api = True
+            return await api_fetch(page)
+
+        return fetch_page
 
     def _filter_movies(
         self, 
-        movies: List[Dict[str, Any]], 
+        movies: List[Movie], 
         genre_ids: Optional[List[int]] = None,
         min_rating: Optional[float] = None
-    ) -> List[Dict[str, Any]]:
+    ) -> List[Movie]:
         """Фильтрует фильмы по жанрам и рейтингу."""
+        required_genres = set(genre_ids) if genre_ids else None
         filtered = []
         
         for movie in movies:
             # Фильтрация по жанрам
-            if genre_ids:
-                movie_genres = set(movie.get("genre_ids", []))
-                if not all(g_id in movie_genres for g_id in genre_ids):
-                    continue
+            if required_genres and not required_genres.issubset(movie.genre_ids):
+                continue
             
             # Фильтрация по рейтингу
-            if min_rating is not None:
-                movie_rating = movie.get("vote_average")
-                if movie_rating is None or movie_rating < min_rating:
-                    continue
+            if min_rating is not None and movie.vote_average < min_rating:
+                continue
             
             filtered.append(movie)
         
         return filtered
 
-    async def search_movies(
+    def open_search(
         self,
         title: Optional[str] = None,
         genre_ids: Optional[List[int]] = None,
@@ -153,28 +314,40 @@ class TMDBApi:
         language: str = "ru-RU",
         region: Optional[str] = None,
         include_adult: bool = False,
-        sort_by: str = "popularity.desc"
-    ) -> List[Dict[str, Any]]:
-        """Ищет фильмы по заданным критериям."""
-        async with aiohttp.ClientSession() as session:
-            movies = []
-            
-            # Поиск по названию
-            if title:
-                search_url = f"{self.base_url}/search/movie"
-                search_params = {
-                    "api_key": self.api_key,
-                    "language": language,
-                    "query": title,
-                    "include_adult": include_adult,
-                    "year": year
-                }
-                search_results = await self._fetch_all_pages(session, search_url, search_params)
-                # Фильтруем результаты поиска по названию
-                filtered_search = self._filter_movies(search_results, genre_ids, min_rating)
-                movies.extend(filtered_search)
-            
-            # Discover для дополнительных фильтров
+        sort_by: str = "popularity.desc",
+        post_process: Optional[BatchFilter] = None
+    ) -> LazySearchResults:
+        """Создает ленивые результаты поиска: страницы TMDB загружаются по мере надобности."""
+        # Избирательность запоминается по набору фильтров, а не по самому названию
+        search_signature = ("search", tuple(sorted(genre_ids or [])), min_rating)
+        plan = query_planner.plan(title, genre_ids, min_rating, search_signature, MOVIES_PER_PAGE)
+        sources = []
+        
+        # Поиск по названию; жанры и рейтинг проверяются локально
+        if plan.uses_search:
+            search_url = f"{self.base_url}/search/movie"
+            search_params = {
+                "api_key": self.api_key,
+                "language": language,
+                "query": title,
+                "include_adult": include_adult,
+                "year": year,
+                "region": region
+            }
+            has_filters = bool(genre_ids) or min_rating is not None
+            sources.append(PagedSource(
+                self._page_fetcher(search_url, search_params),
+                batch_filter=(
+                    (lambda movies: self._filter_movies(movies, genre_ids, min_rating))
+                    if has_filters else None
+                ),
+                signature=search_signature,
+                # /search/movie сортирует по релевантности, а не по sort_by
+                ordered=False
+            ))
+        
+        # Discover: основной источник без названия или ограниченная добавка к поиску
+        if plan.uses_discover:
             discover_url = f"{self.base_url}/discover/movie"
             discover_params = {
                 "api_key": self.api_key,
@@ -186,28 +359,62 @@ class TMDBApi:
                 "include_adult": include_adult,
                 "sort_by": sort_by
             }
-            
-            discover_results = await self._fetch_all_pages(session, discover_url, discover_params)
-            
-            # Объединяем результаты, убирая дубликаты
-            seen_ids = set()
-            combined_movies = []
-            
-            for movie in movies + discover_results:
-                movie_id = movie.get("id")
-                if movie_id and movie_id not in seen_ids:
-                    seen_ids.add(movie_id)
-                    combined_movies.append(movie)
-            
-            return combined_movies
+            sources.append(PagedSource(self._discover_fetcher(discover_url, discover_params, {
+                "genre_ids": genre_ids,
+                "year": year,
+                "min_rating": min_rating,
+                "include_adult": include_adult,
+                "sort_by": sort_by
+            }, language, region), max_pages=plan.discover_pages))
+        
+        # Результаты сливаются в порядке sort_by без дубликатов по мере загрузки
+        return LazySearchResults(sources, post_process, plan=plan, sort_by=sort_by)
+
+    async def search_movies(
+        self,
+        title: Optional[str] = None,
+        genre_ids: Optional[List[int]] = None,
+        year: Optional[int] = None,
+        min_rating: Optional[float] = None,
+        language: str = "ru-RU",
+        region: Optional[str] = None,
+        include_adult: bool = False,
+        sort_by: str = "popularity.desc"
+    ) -> List[Movie]:
+        """Ищет фильмы по заданным критериям (загружает все страницы сразу)."""
+        results = self.open_search(
+            title=title,
+            genre_ids=genre_ids,
+            year=year,
+            min_rating=min_rating,
+            language=language,
+            region=region,
+            include_adult=include_adult,
+            sort_by=sort_by
+        )
+        return await results.ensure_all()
 
     async def get_movie_details(self, movie_id: int) -> Optional[Dict[str, Any]]:
-        """Получает детальную информацию о фильме."""
-        async with aiohttp.ClientSession() as session:
-            url = f"{self.base_url}/movie/{movie_id}"
-            params = {
-                "api_key": self.api_key,
-                "language": "ru-RU",
-                "append_to_response": "credits,videos"
-            }
-            return await self._fetch_with_retries(session, url, params)
\ No newline at end of file
+        """Получает детальную информацию о фильме (устаревшие данные обновляются в фоне)."""
+        url = f"{self.base_url}/movie/{movie_id}"
+        params = {
+            "api_key": self.api_key,
+            "language": "ru-RU",
+            "append_to_response": "credits,videos"
+        }
+        
+        async def load(refresh: bool) -> Dict[str, Any]:
+            return await self._fetch_with_retries(url, params, use_cache=not refresh)
+        
+        return await movie_details_cache.get((movie_id, params["language"]), load)
+
+    async def get_movie_record(self, movie_id: int, language: str) -> Optional[Dict[str, Any]]:
+        """Основные поля фильма без credits и videos, в обход всех кэшей.
+
+        Нужен для сборки каталога: там читаются только жанры, дата и рейтинг,
+        а ответы по всей выгрузке TMDB не должны вытеснять кэши бота.
+        """
+        url = f"{self.base_url}/movie/{movie_id}"
+        params = {"api_key": self.api_key, "language": language}
+        data, _ = await self._request(url, params)
+        return data or None
\ No newline at end of file
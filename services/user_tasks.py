@@ -0,0 +1,85 @@
+import asyncio
+from collections import Counter
+from typing import Any, Awaitable, Dict
+
+
+class TaskSuperseded(Exception):
+    """Задача пользователя отменена: он ушел в меню или начал новый поиск."""
+
+
+class UserTaskRegistry:
+    """Реестр фоновых и текущих задач по пользователям.
+
+    У пользователя не больше одной задачи каждого вида (поиск, прогрев
+    деталей, догрузка результатов, AI). Новая задача того же вида отменяет
+    предыдущую, а при выходе в меню или новом поиске отменяются все сразу,
+    чтобы устаревшая работа не тратила квоту TMDB и процессор.
+    """
+
+    SEARCH = "search"
+    PREFETCH = "prefetch"
+    REFRESH = "refresh"
+    AI = "ai"
+
+    def __init__(self):
+        self._tasks: Dict[int, Dict[str, asyncio.Task]] = {}
+        self.cancelled = Counter()
+
+    def start(self, user_id: int, kind: str, coro: Awaitable[Any]) -> asyncio.Task:
+        """Запускает задачу, отменяя предыдущую задачу того же вида."""
+        self.cancel(user_id, kind)
+        task = asyncio.ensure_future(coro)
+        self._tasks.setdefault(user_id, {})[kind] = task
+        task.add_done_callback(lambda done: self._forget(user_id, kind, done))
+        return task
+
+    async def run(self, user_id: int, kind: str, coro: Awaitable[Any]) -> Any:
+        """Выполняет задачу и возвращает ее результат.
+
+        Если задачу отменили через реестр, вызывается TaskSuperseded, чтобы
+        обработчик мог спокойно завершиться, не путая это с ошибкой или
+        с остановкой самого бота.
+        """
+        task = self.start(user_id, kind, coro)
+        try:
+            await asyncio.wait([task])
+        except asyncio.CancelledError:
+            task.cancel()
+            raise
+        if task.cancelled():
+            raise TaskSuperseded(kind)
+        return task.result()
+
+    def cancel(self, user_id: int, *kinds: str):
+        """Отменяет задачи пользователя указанных видов (без видов - все)."""
+        tasks = self._tasks.get(user_id)
+        if not tasks:
+            return
+        for kind in kinds or list(tasks):
+            task = tasks.pop(kind, None)
+            if task is not None and not task.done():
+                task.cancel()
+                self.cancelled[kind] += 1
+        if not tasks:
+            del self._tasks[user_id]
+
+    def active(self, user_id: int) -> Dict[str, asyncio.Task]:
+        return dict(self._tasks.get(user_id, {}))
+
+    def _forget(self, user_id: int, kind: str, task: asyncio.Task):
+        tasks = self._tasks.get(user_id)
+        if tasks and tasks.get(kind) is task:
+            del tasks[kind]
+            if not tasks:
+                del self._tasks[user_id]
+
+    async def close(self):
+        """Отменяет все задачи всех пользователей."""
+        tasks = [task for user_tasks in self._tasks.values() for task in user_tasks.values()]
+        self._tasks.clear()
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+
+user_tasks = UserTaskRegistry()
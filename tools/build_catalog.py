@@ -0,0 +1,178 @@
+"""Сборка локального каталога фильмов (services.local_catalog).
+
+Источники:
+  * ежедневная выгрузка идентификаторов TMDB (movie_ids_MM_DD_YYYY.json.gz) -
+    из нее берутся самые популярные фильмы, детали которых догружаются из API;
+  * дисковый кэш ответов TMDB - закэшированные страницы поиска и детали фильмов
+    попадают в каталог без единого запроса.
+
+Запуск:
+    python -m tools.build_catalog --download --top 0
+    python -m tools.build_catalog --from-cache
+    python -m tools.build_catalog --export movie_ids_10_16_2026.json.gz --top 5000
+
+Страницы из кэша добавляются как есть: считается, что бот запрашивает их
+на языке каталога (LOCAL_CATALOG_LANGUAGE).
+
+Бот отвечает из каталога, только если он полный: собран по всей выгрузке
+(--top 0) и детали всех фильмов загрузились. Частичная сборка (из кэша или
+топ-N выгрузки) только накапливает фильмы для следующей полной.
+"""
+import argparse
+import asyncio
+import gzip
+import io
+import json
+import os
+import re
+import sqlite3
+import time
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+from config import LOCAL_CATALOG_MAX_AGE, TMDB_DISK_CACHE_PATH
+from services import json_codec
+from services.http_session import close_session, get_session
+from services.local_catalog import local_catalog
+
+
+EXPORT_URL = "http://files.tmdb.org/p/exports/movie_ids_{date}.json.gz"
+EXPORT_DATE = re.compile(r"movie_ids_(\d{2})_(\d{2})_(\d{4})")
+BATCH_SIZE = 500
+
+
+def export_url_for_yesterday() -> str:
+    """Выгрузка за вчера (сегодняшняя появляется в течение дня)."""
+    day = datetime.now(timezone.utc) - timedelta(days=1)
+    return EXPORT_URL.format(date=day.strftime("%m_%d_%Y"))
+
+
+async def read_export(source: str) -> bytes:
+    if source.startswith("http://") or source.startswith("https://"):
+        session = await get_session()
+        async with session.get(source) as resp:
+            resp.raise_for_status()
+            return await resp.read()
+    with open(source, "rb") as f:
+        return f.read()
+
+
+def export_date(source: str) -> Optional[str]:
+    """Дата выгрузки (YYYY-MM-DD) из имени файла."""
+    match = EXPORT_DATE.search(os.path.basename(source))
+    if not match:
+        return None
+    month, day, year = match.groups()
+    return f"{year}-{month}-{day}"
+
+
+def top_export_ids(raw: bytes, top: int) -> Tuple[List[int], int]:
+    """Самые популярные фильмы из выгрузки (без adult и видео) и общее их число; top 0 - все."""
+    entries = []
+    with gzip.open(io.BytesIO(raw), "rt", encoding="utf-8") as f:
+        for line in f:
+            entry = json.loads(line)
+            if entry.get("adult") or entry.get("video"):
+                continue
+            entries.append((entry.get("popularity") or 0.0, entry["id"]))
+    entries.sort(reverse=True)
+    selected = entries[:top] if top else entries
+    return [movie_id for _, movie_id in selected], len(entries)
+
+
+def cached_movies(path: str) -> Iterator[Dict[str, Any]]:
+    """Фильмы из непросроченных ответов дискового кэша TMDB."""
+    conn = sqlite3.connect(f"file:{path}?mode=ro", uri=True)
+    try:
+        for (value,) in conn.execute("SELECT value FROM responses WHERE expires_at > ?", (time.time(),)):
+            try:
+                data = json_codec.loads(value)
+            except ValueError:
+                continue
+            if not isinstance(data, dict):
+                continue
+            if "results" in data:
+                # Страница /search/movie или /discover/movie
+                for movie in data["results"]:
+                    if "genre_ids" in movie and "release_date" in movie:
+                        yield movie
+            elif "genres" in data and "release_date" in data and data.get("id"):
+                # Детали /movie/{id}
+                yield data
+    finally:
+        conn.close()
+
+
+async def fetch_details(movie_ids: List[int], concurrency: int) -> int:
+    """Догружает основные поля фильмов через TMDBApi (лимитер и повторы те же, что у бота)."""
+    from services.tmdb_api import TMDBApi
+
+    api = TMDBApi()
+    semaphore = asyncio.Semaphore(concurrency)
+    stored = 0
+
+    async def fetch(movie_id: int):
+        async with semaphore:
+            return await api.get_movie_record(movie_id, local_catalog.language)
+
+    for start in range(0, len(movie_ids), BATCH_SIZE):
+        batch = movie_ids[start:start + BATCH_SIZE]
+        details = await asyncio.gather(*(fetch(movie_id) for movie_id in batch))
+        stored += local_catalog.upsert_movies(d for d in details if d)
+        print(f"Детали: {min(start + BATCH_SIZE, len(movie_ids))}/{len(movie_ids)}")
+    return stored
+
+
+async def build(args: argparse.Namespace):
+    sources = []
+    complete = False
+    date = None
+
+    if args.from_cache:
+        if os.path.exists(args.from_cache):
+            count = local_catalog.upsert_movies(cached_movies(args.from_cache))
+            print(f"Из кэша ответов: {count} фильмов")
+            sources.append("cache")
+        else:
+            print(f"[ERROR] Disk cache not found: {args.from_cache}")
+
+    export = export_url_for_yesterday() if args.download else args.export
+    if export:
+        try:
+            movie_ids, total = top_export_ids(await read_export(export), args.top)
+            fresh = local_catalog.known_ids(max_age=LOCAL_CATALOG_MAX_AGE)
+            missing = [movie_id for movie_id in movie_ids if movie_id not in fresh]
+            print(f"Выгрузка: {len(movie_ids)} из {total} фильмов, догружаем {len(missing)}")
+            stored = await fetch_details(missing, args.concurrency)
+            sources.append(os.path.basename(export))
+            date = export_date(export)
+            # Полным считается только каталог по всей выгрузке без пропусков
+            complete = len(movie_ids) == total and stored == len(missing)
+        finally:
+            await close_session()
+
+    if sources:
+        local_catalog.mark_built("+".join(sources), complete=complete, export_date=date)
+        state = "полный" if complete else "частичный, для ответов не используется"
+        print(f"Каталог собран ({state}): {local_catalog.path}")
+    local_catalog.close()
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Сборка локального каталога фильмов")
+    parser.add_argument("--from-cache", nargs="?", const=TMDB_DISK_CACHE_PATH, default=None,
+                        help="взять фильмы из дискового кэша ответов TMDB")
+    parser.add_argument("--export", default=None, help="файл или URL выгрузки movie_ids_*.json.gz")
+    parser.add_argument("--download", action="store_true", help="скачать вчерашнюю выгрузку TMDB")
+    parser.add_argument("--top", type=int, default=0,
+                        help="сколько популярных фильмов из выгрузки брать (0 - все, нужно для полного каталога)")
+    parser.add_argument("--concurrency", type=int, default=8, help="параллельных запросов деталей")
+    return parser.parse_args()
+
+
+def main():
+    asyncio.run(build(parse_args()))
+
+
+if __name__ == "__main__":
+    main()
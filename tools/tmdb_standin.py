@@ -0,0 +1,277 @@
+"""Локальная замена TMDB API для офлайн-тестов производительности.
+
+Отдает /search/movie, /discover/movie, /genre/movie/list и /movie/{id}:
+сначала из записанных фикстур, иначе - детерминированные синтетические данные.
+Задержки, ответы 429, ошибки и число страниц настраиваются.
+
+Запуск:
+    python -m tools.tmdb_standin --port 8765 --latency 0.05 --rate-429 0.02
+    TMDB_BASE_URL=http://127.0.0.1:8765/3 python main.py
+
+Запись фикстур с настоящего TMDB (нужен TMDB_API_KEY):
+    python -m tools.tmdb_standin --record --upstream https://api.themoviedb.org/3
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import zlib
+from collections import Counter
+from typing import Any, Dict, Optional
+
+import aiohttp
+from aiohttp import web
+
+from benchmarks.data import GENRES, make_details, make_movie
+
+
+DEFAULT_FIXTURES_DIR = os.path.join(os.path.dirname(__file__), "fixtures", "tmdb")
+
+# Параметры, не влияющие на содержимое ответа
+IGNORED_PARAMS = {"api_key"}
+
+
+class StandInConfig:
+    """Настройки поведения заменителя TMDB."""
+
+    def __init__(
+        self,
+        latency: float = 0.05,
+        jitter: float = 0.02,
+        rate_429: float = 0.0,
+        retry_after: float = 1.0,
+        error_rate: float = 0.0,
+        discover_pages: int = 50,
+        search_pages: int = 5,
+        fixtures_dir: Optional[str] = DEFAULT_FIXTURES_DIR,
+        record: bool = False,
+        upstream: Optional[str] = None,
+        api_key: Optional[str] = None,
+        seed: int = 0
+    ):
+        self.latency = latency
+        self.jitter = jitter
+        self.rate_429 = rate_429
+        self.retry_after = retry_after
+        self.error_rate = error_rate
+        self.discover_pages = discover_pages
+        self.search_pages = search_pages
+        self.fixtures_dir = fixtures_dir
+        self.record = record
+        self.upstream = upstream
+        self.api_key = api_key
+        self.seed = seed
+
+
+class TMDBStandIn:
+    """Обработчики HTTP-запросов заменителя TMDB."""
+
+    def __init__(self, config: StandInConfig):
+        self.config = config
+        self.rng = random.Random(config.seed)
+        self.calls = Counter()
+        self.statuses = Counter()
+        self._upstream_session: Optional[aiohttp.ClientSession] = None
+
+    # ===== Фикстуры =====
+
+    @staticmethod
+    def _query_seed(params: Dict[str, str]) -> int:
+        """Детерминированное зерно по параметрам запроса (без номера страницы)."""
+        key = sorted((k, v) for k, v in params.items() if k not in IGNORED_PARAMS and k != "page")
+        return zlib.crc32(json.dumps(key, ensure_ascii=False).encode("utf-8"))
+
+    def _fixture_path(self, endpoint: str, params: Dict[str, str]) -> Optional[str]:
+        if not self.config.fixtures_dir:
+            return None
+        key = sorted((k, v) for k, v in params.items() if k not in IGNORED_PARAMS)
+        digest = zlib.crc32(json.dumps([endpoint, key], ensure_ascii=False).encode("utf-8"))
+        slug = endpoint.strip("/").replace("/", "_")
+        return os.path.join(self.config.fixtures_dir, slug, f"{digest:08x}.json")
+
+    def _load_fixture(self, path: Optional[str]) -> Optional[Dict[str, Any]]:
+        if not path or not os.path.exists(path):
+            return None
+        with open(path, encoding="utf-8") as f:
+            return json.load(f)["response"]
+
+    def _save_fixture(self, path: str, endpoint: str, params: Dict[str, str], response: Dict[str, Any]):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        request = {k: v for k, v in params.items() if k not in IGNORED_PARAMS}
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump({"endpoint": endpoint, "request": request, "response": response}, f, ensure_ascii=False)
+
+    async def _fetch_upstream(self, endpoint: str, params: Dict[str, str]) -> Optional[Dict[str, Any]]:
+        """Запрашивает настоящий TMDB (режим записи)."""
+        if self._upstream_session is None:
+            self._upstream_session = aiohttp.ClientSession()
+        upstream_params = dict(params)
+        if self.config.api_key:
+            upstream_params["api_key"] = self.config.api_key
+        async with self._upstream_session.get(self.config.upstream + endpoint, params=upstream_params) as resp:
+            if resp.status != 200:
+                return None
+            return await resp.json()
+
+    # ===== Синтетические данные =====
+
+    def _paged(self, params: Dict[str, str], total_pages: int, discover: bool) -> Dict[str, Any]:
+        page = int(params.get("page", 1))
+        seed = self._query_seed(params) % 1000
+        if page > total_pages:
+            return {"page": page, "results": [], "total_pages": total_pages, "total_results": total_pages * 20}
+
+        rng = random.Random(seed * 100003 + page)
+        with_genres = [int(g) for g in params.get("with_genres", "").split(",") if g.strip().isdigit()]
+        year = params.get("primary_release_year") or params.get("year")
+        min_rating = float(params.get("vote_average.gte", 0) or 0)
+
+        results = []
+        for i in range(20):
+            movie_id = seed * 100000 + (page - 1) * 20 + i + 1
+            movie = make_movie(movie_id, rng)
+            # Популярность убывает от страницы к странице, как при сортировке TMDB
+            movie["popularity"] = round(10000.0 / ((page - 1) * 20 + i + 1), 3)
+            if discover:
+                movie["genre_ids"] = sorted(set(movie["genre_ids"]) | set(with_genres))
+                movie["vote_average"] = max(movie["vote_average"], min_rating)
+                if year:
+                    movie["release_date"] = f"{year}{movie['release_date'][4:]}"
+            else:
+                movie["title"] = f"{params.get('query', '')} {movie_id}"
+            results.append(movie)
+
+        return {"page": page, "results": results, "total_pages": total_pages, "total_results": total_pages * 20}
+
+    def _synthetic(self, endpoint: str, params: Dict[str, str]) -> Optional[Dict[str, Any]]:
+        if endpoint == "/genre/movie/list":
+            return {"genres": [{"id": g, "name": name.capitalize()} for name, g in GENRES.items()]}
+        if endpoint == "/discover/movie":
+            return self._paged(params, self.config.discover_pages, discover=True)
+        if endpoint == "/search/movie":
+            pages = 1 + self._query_seed(params) % max(self.config.search_pages, 1)
+            return self._paged(params, pages, discover=False)
+        if endpoint.startswith("/movie/"):
+            movie_id = endpoint.rsplit("/", 1)[1]
+            return make_details(int(movie_id)) if movie_id.isdigit() else None
+        return None
+
+    # ===== HTTP =====
+
+    async def handle(self, request: web.Request) -> web.Response:
+        path = request.match_info["tail"]
+        endpoint = "/" + path
+        params = dict(request.query)
+        kind = "/movie/{id}" if endpoint.startswith("/movie/") else endpoint
+        self.calls[kind] += 1
+
+        delay = self.config.latency + self.rng.uniform(-self.config.jitter, self.config.jitter)
+        if delay > 0:
+            await asyncio.sleep(delay)
+
+        if self.rng.random() < self.config.rate_429:
+            return self._respond(429, {"status_code": 25, "status_message": "Request count over limit"},
+                                 headers={"Retry-After": str(self.config.retry_after)})
+        if self.rng.random() < self.config.error_rate:
+            return self._respond(500, {"status_code": 11, "status_message": "Internal error"})
+
+        fixture_path = self._fixture_path(endpoint, params)
+        data = self._load_fixture(fixture_path)
+        if data is None and self.config.record and self.config.upstream:
+            data = await self._fetch_upstream(endpoint, params)
+            if data is not None and fixture_path:
+                self._save_fixture(fixture_path, endpoint, params, data)
+        if data is None:
+            data = self._synthetic(endpoint, params)
+        if data is None:
+            return self._respond(404, {"status_code": 34, "status_message": "Not found"})
+
+        return self._respond(200, data)
+
+    def _respond(self, status: int, data: Dict[str, Any], headers: Optional[Dict[str, str]] = None) -> web.Response:
+        self.statuses[status] += 1
+        return web.json_response(data, status=status, headers=headers)
+
+    async def handle_stats(self, request: web.Request) -> web.Response:
+        """Счетчики запросов по эндпоинтам и статусам."""
+        return web.json_response({
+            "calls": dict(self.calls),
+            "statuses": {str(k): v for k, v in self.statuses.items()},
+            "total": sum(self.calls.values())
+        })
+
+    async def handle_reset(self, request: web.Request) -> web.Response:
+        self.calls.clear()
+        self.statuses.clear()
+        return web.json_response({"ok": True})
+
+    async def close(self):
+        if self._upstream_session is not None:
+            await self._upstream_session.close()
+
+
+def create_app(config: StandInConfig, base_path: str = "/3") -> web.Application:
+    """Создает aiohttp-приложение заменителя TMDB."""
+    standin = TMDBStandIn(config)
+    app = web.Application()
+    app["standin"] = standin
+    app.router.add_get("/__stats", standin.handle_stats)
+    app.router.add_post("/__reset", standin.handle_reset)
+    app.router.add_get(base_path + "/{tail:.+}", standin.handle)
+
+    async def on_cleanup(_):
+        await standin.close()
+
+    app.on_cleanup.append(on_cleanup)
+    return app
+
+
+async def start_server(config: StandInConfig, host: str = "127.0.0.1", port: int = 8765) -> web.AppRunner:
+    """Запускает сервер в текущем цикле событий (для тестов и нагрузочного стенда)."""
+    runner = web.AppRunner(create_app(config))
+    await runner.setup()
+    await web.TCPSite(runner, host, port).start()
+    return runner
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Локальная замена TMDB API")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--latency", type=float, default=0.05, help="средняя задержка ответа, с")
+    parser.add_argument("--jitter", type=float, default=0.02, help="разброс задержки, с")
+    parser.add_argument("--rate-429", type=float, default=0.0, help="доля ответов 429")
+    parser.add_argument("--retry-after", type=float, default=1.0, help="Retry-After для 429, с")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="доля ответов 500")
+    parser.add_argument("--discover-pages", type=int, default=50)
+    parser.add_argument("--search-pages", type=int, default=5)
+    parser.add_argument("--fixtures", default=DEFAULT_FIXTURES_DIR, help="каталог фикстур")
+    parser.add_argument("--record", action="store_true", help="записывать недостающие ответы с --upstream")
+    parser.add_argument("--upstream", default="https://api.themoviedb.org/3")
+    parser.add_argument("--seed", type=int, default=0)
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+    config = StandInConfig(
+        latency=args.latency,
+        jitter=args.jitter,
+        rate_429=args.rate_429,
+        retry_after=args.retry_after,
+        error_rate=args.error_rate,
+        discover_pages=args.discover_pages,
+        search_pages=args.search_pages,
+        fixtures_dir=args.fixtures,
+        record=args.record,
+        upstream=args.upstream,
+        api_key=os.getenv("TMDB_API_KEY"),
+        seed=args.seed
+    )
+    print(f"🎬 TMDB stand-in: http://{args.host}:{args.port}/3")
+    web.run_app(create_app(config), host=args.host, port=args.port, print=None)
+
+
+if __name__ == "__main__":
+    main()
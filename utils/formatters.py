@@ -1,15 +1,17 @@
 from typing import List, Dict, Any, Optional
 import html
 
+from models.movie import Movie
 
-def format_movie_short(movie: Dict[str, Any], index: int) -> str:
+
+def format_movie_short(movie: Movie, index: int) -> str:
     """Краткое форматирование фильма для списка."""
-    title = html.escape(movie.get("title", "Без названия"))
-    original_title = movie.get("original_title", "")
-    release_date = movie.get("release_date", "")
-    rating = movie.get("vote_average", 0)
-    vote_count = movie.get("vote_count", 0)
-    movie_id = movie.get("id", "N/A")  # ДОБАВИТЬ ЭТУ СТРОКУ
+    title = html.escape(movie.title)
+    original_title = movie.original_title
+    release_date = movie.release_date
+    rating = movie.vote_average
+    vote_count = movie.vote_count
+    movie_id = movie.id
     
     # Форматируем дату
     year = ""
@@ -21,7 +23,7 @@ def format_movie_short(movie: Dict[str, Any], index: int) -> str:
     
     # Оригинальное название если отличается
     orig_title_text = ""
-    if original_title and original_title != movie.get("title", ""):
+    if original_title and original_title != movie.title:
         orig_title_text = f"\n<i>{html.escape(original_title)}</i>"
     
     # Рейтинг с эмодзи
@@ -33,7 +35,13 @@ def format_movie_short(movie: Dict[str, Any], index: int) -> str:
     return f"<b>{index}.</b> <b>{title}</b>{year} <code>[ID: {movie_id}]</code>{orig_title_text}\n{rating_text}"
 
 
-def format_movies_page(movies: List[Dict[str, Any]], page: int, per_page: int) -> str:
+def format_movies_page(
+    movies: List[Movie],
+    page: int,
+    per_page: int,
+    total_count: Optional[int] = None,
+    is_estimate: bool = False
+) -> str:
     """Форматирует страницу с фильмами."""
     if not movies:
         return "😔 Фильмы не найдены"
@@ -42,8 +50,12 @@ def format_movies_page(movies: List[Dict[str, Any]], page: int, per_page: int) -
     end_idx = min(start_idx + per_page, len(movies))
     page_movies = movies[start_idx:end_idx]
     
+    # Для ленивых результатов общее количество может быть оценкой
+    found = total_count if total_count is not None else len(movies)
+    found_text = f"≈{found}" if is_estimate else str(found)
+    
     header = f"🎬 <b>Результаты поиска</b>\n"
-    header += f"📄 Страница {page} • Найдено: {len(movies)}\n"
+    header += f"📄 Страница {page} • Найдено: {found_text}\n"
     header += "─" * 30 + "\n\n"
     
     movies_text = []